@@ -1,13 +1,18 @@
 import logging
+from collections import OrderedDict
+from collections.abc import Callable
 
 import pygame
 
 import auxil
 import log
+import pcm_cache
+from cfg import std_cfg
+from note_bank import SampleBank, SynthBank, np
 from resource_path import resource_path
 
 # Need to initilize mixer before we can load sound
-pygame.mixer.init()
+auxil.init_mixer()
 
 
 class MenuAssets:
@@ -28,88 +33,279 @@ class MenuAssets:
             self.background = None
 
 
+class CacheEntry:
+    """A single asset in the asset cache, with its reference count and estimated size in bytes."""
+
+    def __init__(self, asset: pygame.Surface | pygame.mixer.Sound, size: int) -> None:
+        """Initialize the cache entry.
+
+        Args:
+            asset (pygame.Surface | pygame.mixer.Sound): The loaded asset.
+            size (int): Estimated memory use of the asset in bytes.
+
+        """
+        self.asset = asset
+        self.size = size
+        self.refs = 0
+
+
+class AssetCache:
+    """Process-wide cache of loaded images and sounds, shared between all asset instances.
+
+    Assets are keyed by resource path and transform. Entries are reference counted, and entries that are no longer
+    referenced stay cached so the next song can reuse them. When the cache grows past its memory budget, unreferenced
+    entries are evicted least recently used first.
+
+    Methods:
+        get_image: Get an image, loading and transforming it on the first request
+        get_sound: Get a sound, loading it on the first request
+        release: Release a reference to an asset
+
+    """
+
+    def __init__(self, budget: int) -> None:
+        """Initialize the asset cache.
+
+        Args:
+            budget (int): Memory budget in bytes for the cached assets.
+
+        """
+        self.budget = budget
+        self.entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self.total_size = 0
+
+    def acquire(self, key: tuple, loader: Callable[[], pygame.Surface | pygame.mixer.Sound]) -> CacheEntry:
+        """Get the entry for a key, loading it if not cached, and take a reference to it.
+
+        Args:
+            key (tuple): The cache key of the asset.
+            loader (Callable): Function loading the asset if it is not cached.
+
+        Returns:
+            CacheEntry: The cache entry of the asset.
+
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            asset = loader()
+            entry = CacheEntry(asset, self.asset_size(asset))
+            self.entries[key] = entry
+            self.total_size += entry.size
+            log.log_write("Asset cache loaded %s", logging.DEBUG, key)
+        else:
+            self.entries.move_to_end(key)
+        entry.refs += 1
+        self.evict()
+        return entry
+
+    def get_image(self, path: str, size: tuple[int, int] | None = None, *, flip: bool = False) -> pygame.Surface:
+        """Get an image, loading and transforming it on the first request.
+
+        Args:
+            path (str): Path to the image, relative to the resource path.
+            size (tuple[int, int] | None, optional): Size to scale the image to. Defaults to None.
+            flip (bool, optional): Whether to flip the image in both directions. Defaults to False.
+
+        Returns:
+            pygame.Surface: The shared image, which should only be blitted and never drawn on.
+
+        """
+
+        def load() -> pygame.Surface:
+            if flip:
+                flipped = pygame.transform.flip(self.get_image(path, size), flip_x=True, flip_y=True)
+                # The unflipped image was only needed to build the flipped one
+                self.release(("image", path, size, False))
+                return flipped
+            image = pygame.image.load(resource_path(path)).convert_alpha()
+            if size:
+                image = pygame.transform.scale(image, size)
+            return image
+
+        return self.acquire(("image", path, size, flip), load).asset
+
+    def get_sound(self, path: str) -> pygame.mixer.Sound:
+        """Get a sound, loading it on the first request.
+
+        Args:
+            path (str): Path to the sound, relative to the resource path.
+
+        Returns:
+            pygame.mixer.Sound: The shared sound.
+
+        """
+        return self.acquire(("sound", path), lambda: pcm_cache.load_sound(resource_path(path))).asset
+
+    def release(self, key: tuple) -> None:
+        """Release a reference to an asset, making it evictable when no references are left.
+
+        Args:
+            key (tuple): The cache key of the asset.
+
+        """
+        entry = self.entries.get(key)
+        if entry and entry.refs > 0:
+            entry.refs -= 1
+            self.evict()
+
+    def evict(self) -> None:
+        """Evict unreferenced entries, least recently used first, until the cache is within its budget."""
+        for key in list(self.entries):
+            if self.total_size <= self.budget:
+                break
+            entry = self.entries[key]
+            if entry.refs == 0:
+                del self.entries[key]
+                self.total_size -= entry.size
+                log.log_write("Asset cache evicted %s", logging.DEBUG, key)
+
+    @staticmethod
+    def asset_size(asset: pygame.Surface | pygame.mixer.Sound) -> int:
+        """Estimate the memory use of an asset in bytes.
+
+        Args:
+            asset (pygame.Surface | pygame.mixer.Sound): The asset to estimate.
+
+        Returns:
+            int: Estimated size in bytes.
+
+        """
+        if isinstance(asset, pygame.Surface):
+            return asset.get_width() * asset.get_height() * asset.get_bytesize()
+        frequency, sample_format, channels = pygame.mixer.get_init()
+        return int(asset.get_length() * frequency) * channels * (abs(sample_format) // 8)
+
+
+asset_cache = AssetCache(std_cfg.ASSET_CACHE_BUDGET)
+
+
 class GameAssets:
-    """Class for the game assets. Handles loading and unloading of the game assets."""
+    """Class for the game assets. Handles loading and unloading of the game assets.
+
+    Images and sounds come from the shared asset cache, so starting another song reuses what is already loaded.
+
+    """
+
+    NOTE_SIZE = (172, 172)
+    NOTE_PICTURE_PATHS = {"4": "graphics/quarter2.png", "8": "graphics/half2.png", "16": "graphics/whole2.png"}
+    NOTE_PICTURE_HELP_PATHS = {"4": "graphics/quarter.png", "8": "graphics/half.png", "16": "graphics/whole.png"}
 
     def __init__(self) -> None:
         """Initialize the GameAssets class."""
         self.background = None
+        # Note sounds by note number
+        self.note_sounds: dict[int, pygame.mixer.Sound] | SampleBank | SynthBank = {}
+        self.note_pictures = {}
+        self.note_pictures_help = {}
+        self.note_sprites = {}
+        # Cache keys of every asset this instance holds a reference to
+        self.cache_keys: list[tuple] = []
+
+    def load_image(self, path: str, *, flip: bool = False) -> pygame.Surface:
+        """Get a note sized image from the asset cache and keep a reference to it.
+
+        Args:
+            path (str): Path to the image, relative to the resource path.
+            flip (bool, optional): Whether to flip the image in both directions. Defaults to False.
+
+        Returns:
+            pygame.Surface: The shared image.
+
+        """
+        image = asset_cache.get_image(path, self.NOTE_SIZE, flip=flip)
+        self.cache_keys.append(("image", path, self.NOTE_SIZE, flip))
+        return image
+
+    def load_sound(self, path: str) -> pygame.mixer.Sound:
+        """Get a sound from the asset cache and keep a reference to it.
+
+        Args:
+            path (str): Path to the sound, relative to the resource path.
+
+        Returns:
+            pygame.mixer.Sound: The shared sound.
+
+        """
+        sound = asset_cache.get_sound(path)
+        self.cache_keys.append(("sound", path))
+        return sound
 
     def load(self) -> None:
         """Load the game assets."""
         self.background = pygame.Surface((1280, 720))
         self.background.fill(auxil.WHITE)
 
-        try:
-            self.note_sounds_5 = {
-                pygame.K_a: pygame.mixer.Sound(resource_path("audio/c5.ogg")),
-                pygame.K_s: pygame.mixer.Sound(resource_path("audio/d5.ogg")),
-                pygame.K_d: pygame.mixer.Sound(resource_path("audio/e5.ogg")),
-                pygame.K_f: pygame.mixer.Sound(resource_path("audio/f5.ogg")),
-                pygame.K_g: pygame.mixer.Sound(resource_path("audio/g5.ogg")),
-                pygame.K_h: pygame.mixer.Sound(resource_path("audio/a5.ogg")),
-                pygame.K_j: pygame.mixer.Sound(resource_path("audio/b5.ogg")),
-            }
-            self.note_sounds_6 = {
-                pygame.K_a: pygame.mixer.Sound(resource_path("audio/c6.ogg")),
-                pygame.K_s: pygame.mixer.Sound(resource_path("audio/d6.ogg")),
-                pygame.K_d: pygame.mixer.Sound(resource_path("audio/e6.ogg")),
-                pygame.K_f: pygame.mixer.Sound(resource_path("audio/f6.ogg")),
-                pygame.K_g: pygame.mixer.Sound(resource_path("audio/g6.ogg")),
-                pygame.K_h: pygame.mixer.Sound(resource_path("audio/a6.ogg")),
-                pygame.K_j: pygame.mixer.Sound(resource_path("audio/b6.ogg")),
-            }
-            self.note_sounds = {
-                "5": self.note_sounds_5,
-                "6": self.note_sounds_6,
-            }
-        except (pygame.error, FileNotFoundError):
-            log.log_write("Note sounds not found", logging.CRITICAL)
+        if std_cfg.INSTRUMENT == "synth" and np is not None:
+            self.note_sounds = SynthBank()
+        else:
+            if std_cfg.INSTRUMENT == "synth":
+                log.log_write("NumPy not available, falling back to sampled instrument", logging.WARNING)
+            self.load_note_samples()
 
         try:
             self.note_pictures_help = {
-                "4": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/quarter.png")).convert_alpha(),
-                    (172, 172),
-                ),
-                "8": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/half.png")).convert_alpha(),
-                    (172, 172),
-                ),
-                "16": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/whole.png")).convert_alpha(),
-                    (172, 172),
-                ),
+                note_type: self.load_image(path) for note_type, path in self.NOTE_PICTURE_HELP_PATHS.items()
             }
             self.note_pictures = {
-                "4": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/quarter2.png")).convert_alpha(),
-                    (172, 172),
-                ),
-                "8": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/half2.png")).convert_alpha(),
-                    (172, 172),
-                ),
-                "16": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/whole2.png")).convert_alpha(),
-                    (172, 172),
-                ),
-                "g": pygame.transform.scale(
-                    pygame.image.load(resource_path("graphics/g.png")).convert_alpha(),
-                    (172, 172),
-                ),
+                note_type: self.load_image(path) for note_type, path in self.NOTE_PICTURE_PATHS.items()
             }
+            self.note_pictures["g"] = self.load_image("graphics/g.png")
         except (pygame.error, FileNotFoundError):
             log.log_write("Note pictures not found", logging.CRITICAL)
 
+        self.build_note_sprites()
+
+    def load_note_samples(self) -> None:
+        """Load the recorded note sounds into a sample bank, which derives every other note from them."""
+        try:
+            self.note_sounds = SampleBank("audio", self.load_sound)
+        except (pygame.error, FileNotFoundError):
+            log.log_write("Note sounds not found", logging.CRITICAL)
+        else:
+            if not self.note_sounds.recorded:
+                log.log_write("No recorded note sounds found", logging.CRITICAL)
+
+    def build_note_sprites(self) -> None:
+        """Build every sprite variant of each note type once, so spawning a note only needs a lookup.
+
+        Variants are "normal", "mirrored" (flipped for notes at or above NOTE_MIRROR) and "help"
+        (with the ledger line, for notes below the staff).
+
+        """
+        self.note_sprites = {}
+        for note_type, path in self.NOTE_PICTURE_PATHS.items():
+            self.note_sprites[note_type, "normal"] = self.note_pictures[note_type]
+            self.note_sprites[note_type, "mirrored"] = self.load_image(path, flip=True)
+            self.note_sprites[note_type, "help"] = self.note_pictures_help[note_type]
+
+    def get_note_sprite(self, note_type: int, pitch: int) -> pygame.Surface:
+        """Get the shared sprite for a note.
+
+        Args:
+            note_type (int): Duration or type of note
+            pitch (int): Pitch of the note
+
+        Returns:
+            pygame.Surface: The sprite to draw for the note
+
+        """
+        if pitch >= std_cfg.NOTE_MIRROR:
+            variant = "mirrored"
+        elif pitch == 0:
+            variant = "help"
+        else:
+            variant = "normal"
+        return self.note_sprites[str(note_type), variant]
+
     def unload(self) -> None:
-        """Unload the game assets."""
-        if self.background:
-            self.background = None
-        for octave in self.note_sounds:
-            if self.note_sounds[octave]:
-                for sound in self.note_sounds[octave].values():
-                    sound.stop()
-                self.note_sounds[octave] = {}
-        if self.sprite_manager:
-            self.sprite_manager = None
+        """Unload the game assets, releasing every reference held in the asset cache."""
+        self.background = None
+        for sound in self.note_sounds.values():
+            sound.stop()
+        self.note_sounds = {}
+        self.note_pictures = {}
+        self.note_pictures_help = {}
+        self.note_sprites = {}
+        for key in self.cache_keys:
+            asset_cache.release(key)
+        self.cache_keys = []
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import pygame
 
 from cfg import std_cfg
@@ -12,6 +14,18 @@ BLUE = (0, 0, 255)
 # List of all playable keys
 keys = [pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_f, pygame.K_g, pygame.K_h, pygame.K_j, pygame.K_k]
 
+# Semitone above C of the octave played by each playable key, the last key plays C of the next octave
+key_semitones = {
+    pygame.K_a: 0,
+    pygame.K_s: 2,
+    pygame.K_d: 4,
+    pygame.K_f: 5,
+    pygame.K_g: 7,
+    pygame.K_h: 9,
+    pygame.K_j: 11,
+    pygame.K_k: 12,
+}
+
 # Dictionary mapping playable keys to index in song
 key_dictionary = {
     -1: None,
@@ -26,8 +40,49 @@ key_dictionary = {
 }
 
 
+def note_number(octave: int, semitone: int) -> int:
+    """Get the MIDI note number of a semitone in an octave, where C4 is 60.
+
+    Args:
+        octave (int): The octave.
+        semitone (int): Semitones above C of the octave.
+
+    Returns:
+        int: The note number.
+
+    """
+    return 12 * (octave + 1) + semitone
+
+
+def pitch_note_number(pitch: int) -> int:
+    """Get the note number of a pitch in a chart, which is played by key pitch % 8 in octave pitch // 8 + MIN_OCTAVE.
+
+    Args:
+        pitch (int): The pitch of a note in a chart.
+
+    Returns:
+        int: The note number.
+
+    """
+    return note_number(pitch // 8 + std_cfg.MIN_OCTAVE, key_semitones[keys[pitch % 8]])
+
+
+@lru_cache(maxsize=None)
+def init_mixer() -> None:
+    """Initialize the mixer with the configured format and buffer size, unless it is already initialized."""
+    pygame.mixer.pre_init(
+        frequency=std_cfg.MIXER_FREQUENCY,
+        size=std_cfg.MIXER_SIZE,
+        channels=std_cfg.MIXER_CHANNELS,
+        buffer=std_cfg.MIXER_BUFFER,
+    )
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+
+
+@lru_cache(maxsize=None)
 def get_sysfont(font: str, size: int) -> pygame.font.Font:
-    """Load a system font.
+    """Load a system font, each font and size is only loaded once.
 
     Args:
         font (str): The name of the font.
@@ -40,7 +95,39 @@ def get_sysfont(font: str, size: int) -> pygame.font.Font:
     return pygame.font.SysFont(font, size)
 
 
-def display_fps(clock: pygame.time.Clock, screen: pygame.Surface, color: tuple) -> None:
+@lru_cache(maxsize=None)
+def get_default_font(size: int) -> pygame.font.Font:
+    """Load the default pygame font, each size is only loaded once.
+
+    Args:
+        size (int): The size of the font.
+
+    Returns:
+        pygame.font.Font: The loaded font object.
+
+    """
+    return pygame.font.Font(None, size)
+
+
+@lru_cache(maxsize=256)
+def render_text(text: str, color: tuple, size: int = 36) -> pygame.Surface:
+    """Render text with the default font, reusing the surface while the text and color stay the same.
+
+    The returned surface is shared, so it should only be blitted and never drawn on.
+
+    Args:
+        text (str): The text to render.
+        color (tuple): The color of the text.
+        size (int, optional): The size of the font. Defaults to 36.
+
+    Returns:
+        pygame.Surface: The rendered text.
+
+    """
+    return get_default_font(size).render(text, std_cfg.ANTIALIAS, color)
+
+
+def display_fps(clock: pygame.time.Clock, screen: pygame.Surface, color: tuple) -> pygame.Rect:
     """Display the current frames per second (FPS) on the screen.
 
     Args:
@@ -48,13 +135,15 @@ def display_fps(clock: pygame.time.Clock, screen: pygame.Surface, color: tuple)
         screen (pygame.Surface): The screen surface to draw on.
         color (tuple): The color of the text.
 
+    Returns:
+        pygame.Rect: The area of the screen that was drawn on.
+
     """
-    font = pygame.font.Font(None, 36)
-    fps_text = font.render(f"FPS: {int(clock.get_fps())}", std_cfg.ANTIALIAS, color)
-    screen.blit(fps_text, (10, 90))
+    fps_text = render_text(f"FPS: {int(clock.get_fps())}", color)
+    return screen.blit(fps_text, (10, 90))
 
 
-def display_score(score: float, screen: pygame.Surface, color: tuple) -> None:
+def display_score(score: float, screen: pygame.Surface, color: tuple) -> pygame.Rect:
     """Display the current score on the screen.
 
     Args:
@@ -62,13 +151,15 @@ def display_score(score: float, screen: pygame.Surface, color: tuple) -> None:
         screen (pygame.Surface): The screen surface to draw on.
         color (tuple): The color of the text.
 
+    Returns:
+        pygame.Rect: The area of the screen that was drawn on.
+
     """
-    font = pygame.font.Font(None, 36)
-    score_text = font.render(f"Score: {score}", std_cfg.ANTIALIAS, color)
-    screen.blit(score_text, (10, 10))
+    score_text = render_text(f"Score: {score}", color)
+    return screen.blit(score_text, (10, 10))
 
 
-def display_octave(octave: int, screen: pygame.Surface, color: tuple) -> None:
+def display_octave(octave: int, screen: pygame.Surface, color: tuple) -> pygame.Rect:
     """Display the current octave on the screen.
 
     Args:
@@ -76,7 +167,9 @@ def display_octave(octave: int, screen: pygame.Surface, color: tuple) -> None:
         screen (pygame.Surface): The screen surface to draw on.
         color (tuple): The color of the text.
 
+    Returns:
+        pygame.Rect: The area of the screen that was drawn on.
+
     """
-    font = pygame.font.Font(None, 36)
-    score_text = font.render(f"Current octave: {octave}", std_cfg.ANTIALIAS, color)
-    screen.blit(score_text, (10, 50))
+    score_text = render_text(f"Current octave: {octave}", color)
+    return screen.blit(score_text, (10, 50))
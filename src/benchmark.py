@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+# Imported first, as it selects the SDL dummy drivers before the assets module initialises the mixer
+from simulation import PLAY_CENTER, PLAY_MARGAIN, SimulationClock, init_headless
+
+import pygame
+
+import auxil
+import ui
+from assets import GameAssets
+from cfg import std_cfg
+from game import Game
+from music_engine import ArrayNoteManager, AudioManager, NoteManager, Song, np
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+NOTE_TYPES = (4, 8, 16)
+# Seconds of song played before timing frames, so the screen has filled up with notes
+WARM_UP = (std_cfg.NOTE_SPAWN_X - std_cfg.PLAY_AREA_Y) / std_cfg.NOTE_VELOCITY
+
+
+def generate_chart(
+    path: Path,
+    notes: int,
+    density: float = 0.5,
+    chord_size: int = 1,
+    bpm: int = std_cfg.BPM,
+    slots_per_bar: int = std_cfg.SLOTS_PER_BAR,
+    seed: int = 0,
+) -> None:
+    """Write a synthetic JSON chart with random notes of the given density.
+
+    Args:
+        path (Path): Where to write the chart.
+        notes (int): Total number of notes in the chart.
+        density (float, optional): Fraction of slots that have notes. Defaults to 0.5.
+        chord_size (int, optional): Number of notes in every slot that has notes, at most 8. Defaults to 1.
+        bpm (int, optional): BPM of the chart. Defaults to std_cfg.BPM.
+        slots_per_bar (int, optional): Slots per bar of the chart. Defaults to std_cfg.SLOTS_PER_BAR.
+        seed (int, optional): Seed of the random notes, so the same arguments give the same chart. Defaults to 0.
+
+    """
+    rng = random.Random(seed)
+    chord_size = max(1, min(chord_size, len(auxil.keys)))
+    chart_notes = []
+    slot_index = slots_per_bar  # Leave the first bar empty like the songs do
+    while len(chart_notes) < notes:
+        if rng.random() < density:
+            note_type = rng.choice(NOTE_TYPES)
+            for pitch in sorted(rng.sample(range(len(auxil.keys)), chord_size))[: notes - len(chart_notes)]:
+                chart_notes.append(
+                    {
+                        "bar": slot_index // slots_per_bar + 1,
+                        "slot": slot_index % slots_per_bar + 1,
+                        "note_type": note_type,
+                        "pitch": pitch,
+                    },
+                )
+        slot_index += 1
+
+    chart = {
+        "title": f"Synthetic {notes} notes",
+        "difficulty": "Benchmark",
+        "bpm": bpm,
+        "slots_per_bar": slots_per_bar,
+        "notes": chart_notes,
+    }
+    with path.open("w") as f:
+        json.dump(chart, f)
+
+
+def measure(run: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Time a function a number of times.
+
+    Args:
+        run (Callable[[], object]): The function to time.
+        repeat (int): How many times to run it.
+
+    Returns:
+        dict[str, float]: Median and minimum time of a run in milliseconds.
+
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(times), "min_ms": min(times)}
+
+
+def summarize(times: list[float]) -> dict[str, float]:
+    """Summarize per-call times measured inside a loop.
+
+    Args:
+        times (list[float]): Time of every call in seconds.
+
+    Returns:
+        dict[str, float]: Median and minimum time of a call in milliseconds.
+
+    """
+    return {"median_ms": statistics.median(times) * 1000, "min_ms": min(times) * 1000}
+
+
+def bench_note_manager(
+    manager_class: type[NoteManager],
+    song: Song,
+    assets: GameAssets,
+    frames: int,
+) -> dict[str, dict[str, float]]:
+    """Time every note manager stage per frame over a stretch of the song.
+
+    Args:
+        manager_class (type[NoteManager]): The note manager to time.
+        song (Song): The song to play.
+        assets (GameAssets): Loaded game assets.
+        frames (int): Number of frames to time.
+
+    Returns:
+        dict[str, dict[str, float]]: Timing of every stage.
+
+    """
+    screen = pygame.Surface((std_cfg.SCREEN_WIDTH, std_cfg.SCREEN_HEIGHT))
+    manager = manager_class(song, assets, PLAY_MARGAIN, PLAY_CENTER)
+    frame_time = 1.0 / std_cfg.FPS
+    current_time = 0.0
+    while current_time < WARM_UP:
+        manager.check_note_spawn(current_time)
+        manager.update_notes(current_time)
+        current_time += frame_time
+
+    stages = {"check_note_spawn": [], "update_notes": [], "judge_press": [], "draw": []}
+    for _ in range(frames):
+        current_time += frame_time
+        start = time.perf_counter()
+        manager.check_note_spawn(current_time)
+        spawned = time.perf_counter()
+        manager.update_notes(current_time)
+        updated = time.perf_counter()
+        for key in auxil.keys:
+            manager.judge_press(key, 5, current_time)
+        judged = time.perf_counter()
+        manager.draw(screen)
+        drawn = time.perf_counter()
+        stages["check_note_spawn"].append(spawned - start)
+        stages["update_notes"].append(updated - spawned)
+        stages["judge_press"].append(judged - updated)
+        stages["draw"].append(drawn - judged)
+    return {name: summarize(times) for name, times in stages.items()}
+
+
+def bench_game_draw(chart: Path, frames: int) -> dict[str, float]:
+    """Time drawing whole game frames to an offscreen surface.
+
+    Args:
+        chart (Path): The chart to play.
+        frames (int): Number of frames to time.
+
+    Returns:
+        dict[str, float]: Timing of a frame.
+
+    """
+    screen = pygame.Surface((std_cfg.SCREEN_WIDTH, std_cfg.SCREEN_HEIGHT)).convert()
+    layout = ui.UIAuxil(std_cfg.SCREEN_WIDTH, std_cfg.SCREEN_HEIGHT, ui.Mediator())
+    game = Game(str(chart), layout)
+    note_manager = game.musicplayer.note_manager
+    frame_time = 1.0 / std_cfg.FPS
+    current_time = 0.0
+    while current_time < WARM_UP:
+        note_manager.check_note_spawn(current_time)
+        note_manager.update_notes(current_time)
+        current_time += frame_time
+
+    times = []
+    for _ in range(frames):
+        current_time += frame_time
+        note_manager.check_note_spawn(current_time)
+        note_manager.update_notes(current_time)
+        start = time.perf_counter()
+        game.draw(screen)
+        times.append(time.perf_counter() - start)
+    game.assets.unload()
+    return summarize(times)
+
+
+def run_benchmarks(chart: Path, repeat: int, frames: int) -> dict[str, dict[str, float]]:
+    """Run every benchmark on a chart.
+
+    Args:
+        chart (Path): The chart to run the benchmarks on.
+        repeat (int): How many times to repeat whole-chart benchmarks.
+        frames (int): Number of frames to time in per-frame benchmarks.
+
+    Returns:
+        dict[str, dict[str, float]]: Timing of every benchmark by name.
+
+    """
+    init_headless()
+    assets = GameAssets()
+    assets.load()
+    results = {"Song.from_json": measure(lambda: Song.from_json(str(chart)), repeat)}
+
+    song = Song.from_json(str(chart))
+    last = song.notes[-1]
+    slots = [(bar, slot) for bar in range(1, last.bar + 1) for slot in range(1, song.slots_per_bar + 1)]
+    results["Song.get_notes_for_time (all slots)"] = measure(
+        lambda: [song.get_notes_for_time(bar, slot) for bar, slot in slots],
+        repeat,
+    )
+
+    managers = {"objects": NoteManager}
+    if np is not None:
+        managers["numpy"] = ArrayNoteManager
+    for engine, manager_class in managers.items():
+        for stage, timing in bench_note_manager(manager_class, song, assets, frames).items():
+            results[f"{manager_class.__name__}.{stage} [{engine}]"] = timing
+
+    audio_manager = AudioManager(song, assets, None, SimulationClock())
+
+    def play_keys() -> None:
+        for key in auxil.keys:
+            audio_manager.note_on(key, 5)
+        for key in auxil.keys:
+            audio_manager.note_off(key)
+
+    results["AudioManager.note_on/note_off (all keys)"] = measure(play_keys, repeat)
+    pygame.mixer.stop()
+
+    results[f"Game.draw [{std_cfg.NOTE_ENGINE}]"] = bench_game_draw(chart, frames)
+    assets.unload()
+    return results
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Find the benchmarks that got slower than the baseline by more than the threshold.
+
+    Args:
+        results (dict[str, dict[str, float]]): The new timings.
+        baseline (dict[str, dict[str, float]]): The stored timings to compare with.
+        threshold (float): Allowed slowdown as a fraction, 0.2 allows 20 % slower.
+
+    Returns:
+        list[str]: A line describing every regression.
+
+    """
+    regressions = []
+    for name, timing in results.items():
+        if name not in baseline or baseline[name]["median_ms"] <= 0:
+            continue
+        ratio = timing["median_ms"] / baseline[name]["median_ms"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {timing['median_ms']:.4f} ms vs baseline {baseline[name]['median_ms']:.4f} ms "
+                f"({(ratio - 1) * 100:.0f} % slower)",
+            )
+    return regressions
+
+
+def main() -> None:
+    """Generate charts or run the benchmarks from the command line.
+
+    Example:
+        python benchmark.py run --notes 100000 --chord-size 3 --baseline benchmark_baseline.json
+        python benchmark.py generate songs/dense.json --notes 2000 --density 0.8
+
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the game loop on synthetic charts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate = subparsers.add_parser("generate", help="Write a synthetic chart")
+    generate.add_argument("target", type=Path, help="Where to write the chart")
+    run = subparsers.add_parser("run", help="Run the benchmarks on a synthetic chart")
+    run.add_argument("--output", type=Path, default=Path("benchmark_results.json"), help="Where to write results")
+    run.add_argument("--baseline", type=Path, help="Stored results to compare with")
+    run.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    run.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown against the baseline")
+    run.add_argument("--repeat", type=int, default=5, help="Repeats of whole-chart benchmarks")
+    run.add_argument("--frames", type=int, default=600, help="Frames timed in per-frame benchmarks")
+    for subparser in (generate, run):
+        subparser.add_argument("--notes", type=int, default=10000, help="Number of notes in the chart")
+        subparser.add_argument("--density", type=float, default=0.5, help="Fraction of slots with notes")
+        subparser.add_argument("--chord-size", type=int, default=1, help="Notes in every slot with notes")
+        subparser.add_argument("--bpm", type=int, default=std_cfg.BPM, help="BPM of the chart")
+        subparser.add_argument("--seed", type=int, default=0, help="Seed of the random notes")
+    args = parser.parse_args()
+    chart_args = (args.notes, args.density, args.chord_size, args.bpm, std_cfg.SLOTS_PER_BAR, args.seed)
+
+    if args.command == "generate":
+        generate_chart(args.target, *chart_args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        chart = Path(directory) / "synthetic.json"
+        generate_chart(chart, *chart_args)
+        results = run_benchmarks(chart, args.repeat, args.frames)
+
+    for name, timing in results.items():
+        print(f"{name:<48} {timing['median_ms']:>10.4f} ms (min {timing['min_ms']:.4f} ms)")
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "chart": dict(zip(("notes", "density", "chord_size", "bpm", "slots_per_bar", "seed"), chart_args)),
+        "results": results,
+    }
+    with args.output.open("w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.baseline and args.update_baseline:
+        with args.baseline.open("w") as f:
+            json.dump(report, f, indent=2)
+    elif args.baseline and args.baseline.exists():
+        with args.baseline.open() as f:
+            baseline = json.load(f)
+        if baseline.get("chart") != report["chart"]:
+            print("Baseline was measured on a different chart, comparing anyway")
+        regressions = compare(results, baseline["results"], args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import statistics
+import sys
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pygame
+
+import auxil
+import log
+from cfg import std_cfg
+
+if TYPE_CHECKING:
+    import ui
+
+
+def load_latency_profile() -> dict[str, float]:
+    """Load the latency profile of this machine, or a zero profile if it has not been calibrated.
+
+    Returns:
+        dict[str, float]: "audio_offset" and "visual_offset" in seconds, the delay from a click or flash until
+        the tap for it arrives.
+
+    """
+    profile = {"audio_offset": 0.0, "visual_offset": 0.0}
+    try:
+        with Path(std_cfg.LATENCY_PROFILE_FILE).open() as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return profile
+    for key in profile:
+        if isinstance(stored.get(key), (int, float)):
+            profile[key] = float(stored[key])
+    return profile
+
+
+def save_latency_profile(profile: dict[str, float]) -> None:
+    """Store the latency profile of this machine.
+
+    Args:
+        profile (dict[str, float]): The latency profile to store.
+
+    """
+    try:
+        with Path(std_cfg.LATENCY_PROFILE_FILE).open("w") as f:
+            json.dump(profile, f, indent=2)
+    except OSError as error:
+        log.log_write(f"Could not save latency profile: {error}", logging.ERROR)
+
+
+def make_click() -> pygame.mixer.Sound:
+    """Synthesise a short click in the format of the active mixer.
+
+    Returns:
+        pygame.mixer.Sound: The click sound.
+
+    """
+    frequency, size, channels = pygame.mixer.get_init()
+    length = int(frequency * 0.03)
+    wave = [math.sin(2 * math.pi * 1000 * i / frequency) * math.exp(-i / (length / 5)) for i in range(length)]
+    if size == 32:
+        samples = array("f", wave)
+    elif abs(size) == 8:
+        samples = array("b" if size < 0 else "B", [int(v * 100) + (0 if size < 0 else 128) for v in wave])
+    else:
+        samples = array("h" if size < 0 else "H", [int(v * 20000) + (0 if size < 0 else 32768) for v in wave])
+    interleaved = array(samples.typecode, [sample for sample in samples for _ in range(channels)])
+    return pygame.mixer.Sound(buffer=interleaved.tobytes())
+
+
+class Calibration:
+    """Calibration screen measuring the audio and visual latency of this machine.
+
+    The player taps space along with a click train, and then along with a flashing circle. The median delay from
+    each click or flash to its tap is stored in the latency profile, which the game uses to line up the b-track
+    with the notes and to correct the time of key presses.
+
+    """
+
+    INTERVAL = 0.5
+    LEAD_IN = 4
+    CLICKS = 16
+    MIN_TAPS = 4
+    PHASES = ("audio", "visual")
+
+    def __init__(self, layout: ui.UIAuxil) -> None:
+        """Initialize the calibration and start the first phase.
+
+        Args:
+            layout (ui.UIAuxil): The layout guidelines for the screen.
+
+        """
+        self.layout = layout
+        self.font = auxil.get_sysfont(std_cfg.FONT, 36)
+        self.click = make_click()
+        self.profile = load_latency_profile()
+        self.phase = 0
+        self.done = False
+        self.flash_until = 0.0
+        self.start_phase()
+
+    def start_phase(self) -> None:
+        """Start the click or flash train of the current phase."""
+        self.cue_times: list[float] = []
+        self.tap_times: list[float] = []
+        self.next_cue = pygame.time.get_ticks() / 1000.0 + 2 * self.INTERVAL
+
+    def update(self, dt: float) -> str | None:
+        """Play the cues that came due and record taps.
+
+        Args:
+            dt (float): Time passed since last frame in seconds.
+
+        Returns:
+            str | None: "QUIT_TO_MENU" when the calibration is finished or cancelled, otherwise None.
+
+        """
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE or self.done:
+                    return "QUIT_TO_MENU"
+                if event.key == pygame.K_SPACE:
+                    self.tap_times.append(pygame.time.get_ticks() / 1000.0)
+
+        if self.done:
+            return None
+
+        current_time = pygame.time.get_ticks() / 1000.0
+        if len(self.cue_times) < self.CLICKS and current_time >= self.next_cue:
+            if self.PHASES[self.phase] == "audio":
+                self.click.play()
+            else:
+                self.flash_until = current_time + 0.1
+            # Use the time the cue actually went out, not when it was scheduled
+            self.cue_times.append(current_time)
+            self.next_cue += self.INTERVAL
+        elif len(self.cue_times) == self.CLICKS and current_time >= self.cue_times[-1] + self.INTERVAL:
+            self.finish_phase()
+        return None
+
+    def finish_phase(self) -> None:
+        """Store the measured offset of the current phase and move on to the next one."""
+        cues = self.cue_times[self.LEAD_IN :]
+        offsets = []
+        for tap in self.tap_times:
+            offset = tap - min(cues, key=lambda cue: abs(tap - cue))
+            if abs(offset) < self.INTERVAL / 2:
+                offsets.append(offset)
+
+        phase = self.PHASES[self.phase]
+        if len(offsets) >= self.MIN_TAPS:
+            self.profile[f"{phase}_offset"] = statistics.median(offsets)
+            log.log_write(f"Calibrated {phase} offset {self.profile[f'{phase}_offset']:.3f} s", logging.INFO)
+        else:
+            log.log_write(f"Too few taps to calibrate {phase} offset", logging.WARNING)
+
+        self.phase += 1
+        if self.phase < len(self.PHASES):
+            self.start_phase()
+        else:
+            save_latency_profile(self.profile)
+            self.done = True
+
+    def draw(self, screen: pygame.Surface) -> None:
+        """Draw the instructions, the flash of the visual phase and the result.
+
+        Args:
+            screen (pygame.Surface): The display surface to draw on.
+
+        """
+        screen.fill(self.layout.colors["background"])
+        if self.done:
+            lines = [
+                f"Audio offset: {self.profile['audio_offset'] * 1000:.0f} ms",
+                f"Visual offset: {self.profile['visual_offset'] * 1000:.0f} ms",
+                "Press any key to return",
+            ]
+        elif self.PHASES[self.phase] == "audio":
+            lines = ["Tap space along with the clicks", "Esc to cancel"]
+        else:
+            lines = ["Tap space along with the flashing circle", "Esc to cancel"]
+
+        y = self.layout.content_start_y
+        for line in lines:
+            text = self.font.render(line, std_cfg.ANTIALIAS, self.layout.colors["text"])
+            rect = screen.blit(text, text.get_rect(centerx=self.layout.x_center, y=y))
+            y = rect.bottom + self.layout.pad_y
+
+        if not self.done and pygame.time.get_ticks() / 1000.0 < self.flash_until:
+            pygame.draw.circle(screen, auxil.RED, (self.layout.x_center, self.layout.y_center + 100), 40)
@@ -8,12 +8,15 @@ class Config:
     SCREEN_WIDTH = 1280
     SCREEN_HEIGHT = 720
     FPS = 60
+    # Longest time in ms the idle menu sleeps on the event queue before checking again
+    MENU_IDLE_TIMEOUT = 500
 
     # Game settings
     BPM = 120
     BEATS_PER_BAR = 4
     SLOTS_PER_BAR = 16
     NOTE_VELOCITY = 300
+    NOTE_SPAWN_X = 1200
     FADEOUT = 250
     FONT = "courier new"
     MIN_OCTAVE = 5
@@ -21,6 +24,37 @@ class Config:
     NOTE_MIRROR = 7
     B_TRACK_VOL = 0.5
 
+    # Mixer settings, a smaller buffer lowers the delay from playing a sound until it is heard
+    MIXER_FREQUENCY = 44100
+    MIXER_SIZE = -16
+    MIXER_CHANNELS = 2
+    MIXER_BUFFER = 512
+    # Mixer channels reserved for notes, when all are sounding the oldest note is cut off for a new one. One more
+    # channel is reserved for a fully decoded b-track, and MIXER_SPARE_CHANNELS are left for other sounds
+    NOTE_VOICES = 16
+    MIXER_SPARE_CHANNELS = 4
+    # "samples" plays the recorded note sounds, "synth" synthesises every note of a piano (requires NumPy), keeping
+    # at most SYNTH_CACHE_SIZE generated notes in memory
+    INSTRUMENT = "samples"
+    SYNTH_CACHE_SIZE = 32
+    # Notes without a recording are resampled from the nearest recorded note on first use, keeping at most
+    # SAMPLE_BANK_BUDGET bytes of resampled notes in memory, and in the PCM cache on disk with SAMPLE_BANK_PERSIST
+    SAMPLE_BANK_BUDGET = 32 * 1024 * 1024
+    SAMPLE_BANK_PERSIST = True
+    # Per-machine audio and visual latency measured by the calibration screen
+    LATENCY_PROFILE_FILE = "latency_profile.json"
+    # Stream the b-track through pygame.mixer.music instead of decoding it fully into memory
+    B_TRACK_STREAM = True
+    # Memory budget in bytes for loaded images and sounds kept around between songs
+    ASSET_CACHE_BUDGET = 64 * 1024 * 1024
+    # Keep pre-decoded PCM data of sounds on disk, so they skip the OGG/MP3 decoder on later starts
+    PCM_CACHE = True
+    PCM_CACHE_DIR = "pcm_cache"
+    # Cached title, difficulty and bpm of every chart, so the song list does not parse every chart on startup
+    SONG_INDEX_FILE = "song_index.json"
+    # "objects" keeps a Python object per active note, "numpy" uses array columns (requires NumPy)
+    NOTE_ENGINE = "objects"
+
     # Play area settings
     PLAY_AREA_X = 350
     PLAY_AREA_WIDTH = 20
@@ -29,10 +63,25 @@ class Config:
     HIT_WINDOW = 15
 
     ANTIALIAS = True
+    # Only redraw and present the parts of the screen that changed during a song
+    DIRTY_RECTS = False
+
+    # Record the time of every stage of the last PROFILER_FRAMES frames. During a song F3 shows the profiler
+    # overlay and F4 writes the recorded frames to PROFILER_CSV_FILE
+    PROFILER = False
+    PROFILER_FRAMES = 600
+    PROFILER_CSV_FILE = "frame_profile.csv"
+
+    # Record the key events of every song played, to check scores and reproduce bugs by playing them back
+    RECORD_REPLAYS = True
+    REPLAY_DIR = "replays"
 
     # Logging settings
     DEBUG_MODE = False
     LOG_FILE = "game.log"
+    # The log is rotated on every start and when it grows past LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old logs
+    LOG_MAX_BYTES = 1024 * 1024
+    LOG_BACKUP_COUNT = 3
     LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
     LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
     if DEBUG_MODE:
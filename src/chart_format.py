@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# A binary chart starts with a header followed by one fixed-width record per note, all little-endian:
+#   header: magic, version, slots_per_bar, bpm, note count,
+#           then title, difficulty and b_path as u16 length prefixed UTF-8 strings
+#   record: bar, slot, note_type, pitch, sorted by bar and slot
+MAGIC = b"PGCH"
+VERSION = 1
+SUFFIX = ".pgc"
+HEADER = struct.Struct("<4sHHdI")
+STRING_LENGTH = struct.Struct("<H")
+RECORD = struct.Struct("<IHHh")
+RECORD_DTYPE = [("bar", "<u4"), ("slot", "<u2"), ("note_type", "<u2"), ("pitch", "<i2")]
+
+
+def is_binary(path: str | Path) -> bool:
+    """Check whether a chart file is in the binary format.
+
+    Args:
+        path (str | Path): Path to the chart file.
+
+    Returns:
+        bool: True if the file starts with the binary chart magic, False otherwise.
+
+    """
+    with Path(path).open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_chart(data: dict) -> bytes:
+    """Encode chart data in the JSON schema as a binary chart.
+
+    Args:
+        data (dict): Chart data with bpm, slots_per_bar, notes and optionally title, difficulty and b_path.
+
+    Returns:
+        bytes: The binary chart.
+
+    """
+    notes = sorted((note["bar"], note["slot"], note["note_type"], note["pitch"]) for note in data["notes"])
+    parts = [HEADER.pack(MAGIC, VERSION, data["slots_per_bar"], data["bpm"], len(notes))]
+    for key in ("title", "difficulty", "b_path"):
+        encoded = (data.get(key) or "").encode()
+        parts.append(STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    parts.extend(RECORD.pack(*note) for note in notes)
+    return b"".join(parts)
+
+
+def read_header(buffer: bytes | mmap.mmap) -> tuple[dict, int, int]:
+    """Read the header of a binary chart.
+
+    Args:
+        buffer (bytes | mmap.mmap): The binary chart.
+
+    Returns:
+        tuple[dict, int, int]: The chart data without notes, the offset of the first record and the number of notes.
+
+    """
+    magic, version, slots_per_bar, bpm, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        msg = f"Not a version {VERSION} binary chart"
+        raise ValueError(msg)
+    data = {"bpm": int(bpm) if bpm.is_integer() else bpm, "slots_per_bar": slots_per_bar}
+    offset = HEADER.size
+    for key in ("title", "difficulty", "b_path"):
+        (length,) = STRING_LENGTH.unpack_from(buffer, offset)
+        offset += STRING_LENGTH.size
+        data[key] = bytes(buffer[offset : offset + length]).decode() or None
+        offset += length
+    if len(buffer) < offset + count * RECORD.size:
+        msg = "Binary chart is truncated"
+        raise ValueError(msg)
+    return data, offset, count
+
+
+def read_binary(path: str | Path) -> dict:
+    """Read a binary chart.
+
+    The file is memory-mapped and, with NumPy available, the note records are a structured array over the mapping
+    made with one numpy.frombuffer call, so they are never copied or unpacked one by one.
+
+    Args:
+        path (str | Path): Path to the binary chart.
+
+    Returns:
+        dict: Chart data, with the notes under "notes". With NumPy they are a structured array with bar, slot,
+        note_type and pitch fields, which keeps the file mapped for as long as it is referenced. Without NumPy
+        they are (bar, slot, note_type, pitch) tuples.
+
+    """
+    with Path(path).open("rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data, offset, count = read_header(buffer)
+    if np is not None:
+        # The array holds a reference to the mapping, which is closed when the array is freed
+        data["notes"] = np.frombuffer(buffer, dtype=RECORD_DTYPE, count=count, offset=offset)
+    else:
+        with buffer:
+            data["notes"] = list(RECORD.iter_unpack(buffer[offset : offset + count * RECORD.size]))
+    return data
+
+
+def read_metadata(path: str | Path) -> dict:
+    """Read only the header of a binary chart.
+
+    Args:
+        path (str | Path): Path to the binary chart.
+
+    Returns:
+        dict: The chart data without notes.
+
+    """
+    with Path(path).open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return read_header(buffer)[0]
+
+
+def to_binary(source: Path, target: Path) -> None:
+    """Convert a JSON chart to a binary chart.
+
+    Args:
+        source (Path): Path to the JSON chart.
+        target (Path): Path to write the binary chart to.
+
+    """
+    with source.open() as f:
+        data = json.load(f)
+    target.write_bytes(encode_chart(data))
+
+
+def to_json(source: Path, target: Path) -> None:
+    """Convert a binary chart to a JSON chart.
+
+    Args:
+        source (Path): Path to the binary chart.
+        target (Path): Path to write the JSON chart to.
+
+    """
+    data = read_binary(source)
+    chart = {key: data[key] for key in ("title", "difficulty", "bpm", "slots_per_bar", "b_path") if data[key]}
+    notes = data["notes"].tolist() if np is not None else data["notes"]
+    chart["notes"] = [
+        {"bar": bar, "slot": slot, "note_type": note_type, "pitch": pitch} for bar, slot, note_type, pitch in notes
+    ]
+    with target.open("w") as f:
+        json.dump(chart, f, indent=2)
+
+
+def main() -> None:
+    """Run the chart converter from the command line.
+
+    Example:
+        python chart_format.py to-binary songs/lullaby.json songs/lullaby.pgc
+
+    """
+    parser = argparse.ArgumentParser(description="Convert charts between the JSON and binary chart formats.")
+    parser.add_argument("direction", choices=["to-binary", "to-json"], help="Direction of the conversion")
+    parser.add_argument("source", type=Path, help="Chart to convert")
+    parser.add_argument("target", type=Path, nargs="?", help="Output path, defaults to source with new suffix")
+    args = parser.parse_args()
+
+    if args.direction == "to-binary":
+        to_binary(args.source, args.target or args.source.with_suffix(SUFFIX))
+    else:
+        to_json(args.source, args.target or args.source.with_suffix(".json"))
+
+
+if __name__ == "__main__":
+    main()
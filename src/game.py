@@ -6,11 +6,17 @@ import pygame
 
 import auxil
 from assets import GameAssets
+from calibration import load_latency_profile
 from cfg import std_cfg
+from loader import prepare_song
 from music_engine import MusicPlayer
+from profiler import profiler
+from replay import replay_path
 
 if TYPE_CHECKING:
     import ui
+    from loader import PreparedSong
+    from replay import Replay
 
 
 class Game:
@@ -24,26 +30,33 @@ class Game:
 
     """
 
-    def __init__(self, data: str, layout: ui.UIAuxil) -> None:
+    def __init__(
+        self,
+        data: str,
+        layout: ui.UIAuxil,
+        prepared: PreparedSong | None = None,
+        replay: Replay | None = None,
+    ) -> None:
         """Initialize the Game class.
 
         Args:
             data (str): The file path for the song selected.
             layout (UIAuxil): The layout guidelines for the game.
+            prepared (PreparedSong | None, optional): The song already prepared by the song loader.
+                Defaults to None, in which case it is prepared here.
+            replay (Replay | None, optional): Replay to play back. Defaults to None, in which case the player
+                plays and is recorded.
 
         """
+        self.data = data
         self.assets = GameAssets()
         self.assets.load()
         self.layout = layout
 
-        self.scaled_background = None
-        if (
-            self.layout.x_unit * 100 != std_cfg.SCREEN_WIDTH or self.layout.y_unit * 100 != std_cfg.SCREEN_HEIGHT
-        ) and self.assets.background:
-            self.scaled_background = pygame.transform.scale(
-                self.assets.background,
-                (self.layout.x_unit * 100, self.layout.y_unit * 100),
-            )
+        # Static part of the screen, composited once and rebuilt only when the screen size changes
+        self.playfield: pygame.Surface | None = None
+        # Areas drawn on in the previous frame when using dirty rects, None forces a full redraw
+        self.last_dirty: list[pygame.Rect] | None = None
 
         # For now we use hardcoded values for the layout when the game is running
 
@@ -58,39 +71,90 @@ class Game:
         self.play_width = self.play_box[2] / 2
         self.play_center = self.play_box[0] + self.play_width
 
-        # 1200 is the hardcoded value for where we spawn notes on screen
-        # A 0.1 sec correction is neccesacry, not sure why
-
-        self.play_b_delay = 0.1 + (1200 - self.play_center) / std_cfg.NOTE_VELOCITY
-
-        self.musicplayer = MusicPlayer(data, self.assets, self.play_center, self.play_width, self.play_b_delay)
-
-    def draw(self, screen: pygame.Surface) -> None:
-        """Draw the background, static part of the music player, and the spite(s).
+        prepared = prepared or prepare_song(data)
+
+        # The first slot spawns one slot after the start and then travels to the play area. The b-track is started
+        # earlier by how much later the player hears audio than they see the screen on this machine.
+        latency = load_latency_profile()
+        time_per_slot = 60 / (prepared.song.bpm * prepared.song.slots_per_bar / std_cfg.BEATS_PER_BAR)
+        self.play_b_delay = max(
+            0.0,
+            time_per_slot
+            + (std_cfg.NOTE_SPAWN_X - self.play_center) / std_cfg.NOTE_VELOCITY
+            - (latency["audio_offset"] - latency["visual_offset"]),
+        )
+        self.musicplayer = MusicPlayer(
+            prepared.song,
+            self.assets,
+            self.play_center,
+            self.play_width,
+            self.play_b_delay,
+            prepared.b_track,
+            # A replay is judged with the latency correction it was recorded with, to reproduce its score
+            replay.input_offset if replay else latency["visual_offset"],
+            replay=replay,
+        )
+
+    def build_playfield(self, size: tuple[int, int]) -> None:
+        """Composite the background, staff lines, G-clef and play box into the cached playfield layer.
 
         Args:
-            screen (pygame.Surface): The display surface for the game.
+            size (tuple[int, int]): The size of the screen.
 
         """
-        if self.scaled_background:
-            screen.blit(self.scaled_background, (0, 0))
+        self.playfield = pygame.Surface(size).convert()
+
+        if self.assets.background and self.assets.background.get_size() != size:
+            self.playfield.blit(pygame.transform.scale(self.assets.background, size), (0, 0))
         elif self.assets.background:
-            screen.blit(self.assets.background, (0, 0))
+            self.playfield.blit(self.assets.background, (0, 0))
         else:
-            screen.fill(self.layout.colors["background"])
+            self.playfield.fill(self.layout.colors["background"])
 
         for i in range(self.lines):
             pygame.draw.line(
-                screen,
+                self.playfield,
                 auxil.BLACK,
                 (self.line_left, self.line_lower - i * self.line_gap),
                 (self.line_right, self.line_lower - i * self.line_gap),
                 self.line_thick,
             )
-        screen.blit(self.assets.note_pictures["g"], (200, 74))
-        self.play_box = pygame.draw.rect(screen, (0, 255, 0), self.play_box)  # x,y,width,height
+        self.playfield.blit(self.assets.note_pictures["g"], (200, 74))
+        self.play_box = pygame.draw.rect(self.playfield, (0, 255, 0), self.play_box)  # x,y,width,height
 
-        self.musicplayer.draw(screen)
+    def draw(self, screen: pygame.Surface) -> list[pygame.Rect] | None:
+        """Draw the static playfield layer and the music player on top of it.
+
+        With dirty rects enabled only the areas drawn on in the previous frame are restored from the playfield,
+        and the areas to present on the display are returned.
+
+        Args:
+            screen (pygame.Surface): The display surface for the game.
+
+        Returns:
+            list[pygame.Rect] | None: Areas of the screen to update, or None if the whole screen should be flipped.
+
+        """
+        if self.playfield is None or self.playfield.get_size() != screen.get_size():
+            self.build_playfield(screen.get_size())
+            self.last_dirty = None
+
+        if not std_cfg.DIRTY_RECTS or self.last_dirty is None:
+            screen.blit(self.playfield, (0, 0))
+            profiler.lap("playfield")
+            dirty = self.musicplayer.draw(screen)
+            if not std_cfg.DIRTY_RECTS:
+                return None
+            self.last_dirty = dirty
+            return [screen.get_rect()]
+
+        for rect in self.last_dirty:
+            screen.blit(self.playfield, rect, rect)
+        profiler.lap("playfield")
+        dirty = self.musicplayer.draw(screen)
+        presented = self.last_dirty + dirty
+        self.last_dirty = dirty
+        return presented
 
     def update(self, dt: float) -> str | None:
         """Update the music player and the sprite(s).
@@ -103,3 +167,11 @@ class Game:
 
         """
         return self.musicplayer.update(dt)
+
+    def unload(self) -> None:
+        """Stop the song, save the replay of the player and release the game assets."""
+        self.musicplayer.stop()
+        recorder = self.musicplayer.recorder
+        if recorder and recorder.count:
+            recorder.save(replay_path(self.data), self.data, self.musicplayer.input_offset, self.musicplayer.score)
+        self.assets.unload()
@@ -1,20 +1,25 @@
 from __future__ import annotations
 
 import sys
+from typing import TYPE_CHECKING
 
 import pygame
 
 import ui
+from calibration import Calibration
 from cfg import std_cfg
 from game import Game
+from loader import SongLoader
 from menu import MenuManager
 
+if TYPE_CHECKING:
+    from replay import Replay
+
 
 class GameStateManager:
     """Manages the state transitions and updates for the game.
 
     Todo:
-        * Implement asset deloading on state transition.
         * Use layout guidelines in game and change transition screen size.
         * Add enum class in auxil for transitions and actions instead of using strings.
 
@@ -31,7 +36,10 @@ class GameStateManager:
         self.mediator = ui.Mediator()
         self.layout = ui.UIAuxil(std_cfg.SCREEN_WIDTH, std_cfg.SCREEN_HEIGHT, self.mediator)
         self.menu_manager = MenuManager(self.layout, self.mediator)
+        self.song_loader = SongLoader()
         self.current_state = "MENU"
+        self.game: Game | None = None
+        self.calibration: Calibration | None = None
 
     def update(self, dt: float) -> None:
         """Update the menu or game state based on input and elapsed time.
@@ -41,7 +49,11 @@ class GameStateManager:
 
         """
         if self.current_state == "MENU":
-            for event in pygame.event.get():
+            events = pygame.event.get()
+            if not events and not self.menu_manager.needs_redraw:
+                # Nothing to redraw, so sleep until an event arrives instead of spinning the loop
+                events = [pygame.event.wait(std_cfg.MENU_IDLE_TIMEOUT), *pygame.event.get()]
+            for event in events:
                 if event.type == pygame.VIDEORESIZE:
                     width, height = event.size
                     # Using std. screen size as minimum for now
@@ -56,8 +68,12 @@ class GameStateManager:
                     pygame.quit()
                     sys.exit()
                 action, data = self.menu_manager.handle_input(event)
-                if action == "START_GAME":
+                if action in ("START_GAME", "START_CALIBRATION"):
                     self.handle_state_transition(action, data)
+                elif action == "PREFETCH_SONG":
+                    self.song_loader.prefetch(data)
+                elif action == "CANCEL_PREFETCH":
+                    self.song_loader.cancel()
 
         elif self.current_state == "GAME":
             # In Game we need to update every frame without there being an input, so we handle quit inside
@@ -66,14 +82,27 @@ class GameStateManager:
             if game_status == "QUIT_TO_MENU":
                 self.handle_state_transition("RETURN_TO_MENU", None)
 
-    def draw(self) -> None:
-        """Draw the menu or game state to the screen."""
+        elif self.current_state == "CALIBRATION" and self.calibration:
+            if self.calibration.update(dt) == "QUIT_TO_MENU":
+                self.handle_state_transition("RETURN_TO_MENU", None)
+
+    def draw(self) -> list[pygame.Rect] | None:
+        """Draw the menu or game state to the screen.
+
+        Returns:
+            list[pygame.Rect] | None: Areas of the screen to update, or None if the whole screen should be flipped.
+
+        """
         if self.current_state == "MENU":
-            self.menu_manager.draw(self.screen)
+            if not self.menu_manager.draw(self.screen):
+                return []
         elif self.current_state == "GAME" and self.game:
-            self.game.draw(self.screen)
+            return self.game.draw(self.screen)
+        elif self.current_state == "CALIBRATION" and self.calibration:
+            self.calibration.draw(self.screen)
+        return None
 
-    def handle_state_transition(self, action: str, data: str | None) -> None:
+    def handle_state_transition(self, action: str, data: str | None, replay: Replay | None = None) -> None:
         """Handle a state transition between menu and game.
 
         Starts a new game instance with the selected song from data when requested.
@@ -81,8 +110,9 @@ class GameStateManager:
         Returns back to menu when requested from a game instance.
 
         Args:
-            action (str): The action to perform ("START_GAME" or "RETURN_TO_MENU").
+            action (str): The action to perform ("START_GAME", "START_CALIBRATION" or "RETURN_TO_MENU").
             data (str): The file path to the json file containing the song data
+            replay (Replay | None, optional): Replay to play back in the started game. Defaults to None.
 
         """
         if action == "START_GAME":
@@ -91,9 +121,16 @@ class GameStateManager:
             self.current_state = "GAME"
             # Instance of game starts the internal game clock, so we start a new "Game" when a song is picked
             if data:
-                self.game = Game(data, self.layout)
+                self.game = Game(data, self.layout, self.song_loader.take(data), replay)
+        elif action == "START_CALIBRATION":
+            self.current_state = "CALIBRATION"
+            self.calibration = Calibration(self.layout)
         elif action == "RETURN_TO_MENU":
             width, height = self.screen.get_width(), self.screen.get_height()
             self.screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
             self.current_state = "MENU"
+            if self.game:
+                self.game.unload()
             self.game = None
+            self.calibration = None
+            self.menu_manager.needs_redraw = True
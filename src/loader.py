@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import pygame
+
+import log
+from music_engine import AudioManager, Song
+
+if TYPE_CHECKING:
+    from music_engine import StreamedBTrack
+
+
+class PreparedSong:
+    """A song with its chart parsed and b-track loaded, ready to start a game with."""
+
+    def __init__(self, song: Song, b_track: pygame.mixer.Sound | StreamedBTrack | None) -> None:
+        """Initialize the prepared song.
+
+        Args:
+            song (Song): The parsed song.
+            b_track (pygame.mixer.Sound | StreamedBTrack | None): The loaded b-track, or None if the song has none.
+
+        """
+        self.song = song
+        self.b_track = b_track
+
+
+def prepare_song(filename: str) -> PreparedSong:
+    """Parse the chart of a song and load its b-track.
+
+    Args:
+        filename (str): The file path to the chart file containing the song data.
+
+    Returns:
+        PreparedSong: The prepared song.
+
+    """
+    song = Song.from_file(filename)
+    return PreparedSong(song, AudioManager.load_b_track(song))
+
+
+class SongLoader:
+    """Prepares songs on a background thread, so starting a song does not freeze the window.
+
+    Methods:
+        prefetch: Start preparing a song in the background
+        cancel: Drop every pending prefetch
+        take: Get a prepared song, waiting for or doing the work if needed
+
+    """
+
+    def __init__(self) -> None:
+        """Initialize the song loader with a single worker thread."""
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="song-loader")
+        self.futures: dict[str, Future[PreparedSong]] = {}
+
+    def prefetch(self, filename: str) -> None:
+        """Start preparing a song in the background, dropping prefetches of other songs.
+
+        Args:
+            filename (str): The file path to the json file containing the song data.
+
+        """
+        if filename in self.futures:
+            return
+        self.cancel()
+        log.log_write("Prefetching %s", logging.DEBUG, filename)
+        self.futures[filename] = self.executor.submit(prepare_song, filename)
+
+    def cancel(self) -> None:
+        """Drop every pending prefetch. Work that already started finishes in the background and is discarded."""
+        for future in self.futures.values():
+            future.cancel()
+        self.futures = {}
+
+    def take(self, filename: str) -> PreparedSong:
+        """Get a prepared song, using a prefetch if there is one and otherwise preparing it right away.
+
+        Args:
+            filename (str): The file path to the json file containing the song data.
+
+        Returns:
+            PreparedSong: The prepared song.
+
+        """
+        future = self.futures.pop(filename, None)
+        self.cancel()
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except (pygame.error, OSError, ValueError, KeyError) as error:
+                log.log_write(f"Prefetch of {filename} failed: {error}", logging.WARNING)
+        return prepare_song(filename)
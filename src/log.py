@@ -1,47 +1,84 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 import pygame
 
 from cfg import std_cfg
 
+logger = logging.getLogger(__name__)
+# Background thread writing the queued log records to the log file and console
+listener: QueueListener | None = None
+
 
 def setup_logger() -> None:
-    """Initialize the logger for the game."""
-    if Path(std_cfg.LOG_FILE).exists() and not std_cfg.DEBUG_MODE:
-        Path(std_cfg.LOG_FILE).unlink()
-    handlers: list[logging.Handler] = [logging.FileHandler(std_cfg.LOG_FILE)]
+    """Initialize the logger for the game.
+
+    Log calls only put their record on a queue, and a background thread formats and writes them, so logging never
+    blocks a frame on file I/O. The log file is rotated when it grows past LOG_MAX_BYTES and on every start, keeping
+    LOG_BACKUP_COUNT old logs instead of deleting them.
+
+    """
+    global listener
+    if listener is not None:
+        return
+
+    file_handler = RotatingFileHandler(
+        std_cfg.LOG_FILE,
+        maxBytes=std_cfg.LOG_MAX_BYTES,
+        backupCount=std_cfg.LOG_BACKUP_COUNT,
+        delay=True,
+    )
+    if Path(std_cfg.LOG_FILE).exists() and Path(std_cfg.LOG_FILE).stat().st_size > 0:
+        file_handler.doRollover()
+    handlers: list[logging.Handler] = [file_handler]
     if std_cfg.LOG_TO_CONSOLE:
         handlers.append(logging.StreamHandler())
+    formatter = logging.Formatter(std_cfg.LOG_FORMAT, std_cfg.LOG_DATE_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
 
-    logging.basicConfig(
-        level=std_cfg.LOG_LEVEL,
-        format=std_cfg.LOG_FORMAT,
-        datefmt=std_cfg.LOG_DATE_FORMAT,
-        handlers=handlers,
-    )
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(std_cfg.LOG_LEVEL)
+    root.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logger)
 
-    logger = logging.getLogger(__name__)
     logger.info("Logger initialized")
 
 
-def log_write(message: str, level: int = logging.INFO) -> None:
-    """Log a message with the specified level."""
-    logger = logging.getLogger(__name__)
-    if level <= logging.DEBUG:
-        logger.debug(message)
-    elif level <= logging.INFO:
-        logger.info(message)
-    elif level <= logging.WARNING:
-        logger.warning(message)
-    elif level <= logging.ERROR:
-        logger.error(message)
-    elif level <= logging.CRITICAL:
-        logger.critical(message)
+def stop_logger() -> None:
+    """Write out the queued log records and stop the background thread."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+def log_write(message: str, level: int = logging.INFO, *args: object) -> None:
+    """Log a message with the specified level.
+
+    The message is only formatted when the level is enabled, so passing values as %-style args instead of
+    formatting them into the message makes disabled log calls nearly free.
+
+    Args:
+        message (str): The message, optionally with %-style placeholders for args
+        level (int, optional): The log level. Defaults to logging.INFO.
+        *args (object): Values for the placeholders in message
+
+    """
+    if level > logging.CRITICAL:
+        logger.error("Invalid log level: %s. Message: %s", level, message % args if args else message)
+    elif level > logging.ERROR:
+        logger.critical(message, *args)
         logger.critical("Critical error detected, exiting game")
+        stop_logger()
         pygame.quit()
         sys.exit(1)
-    else:
-        message = f"Invalid log level: {level}. Message: {message}"
-        logger.error(message)
+    elif logger.isEnabledFor(level):
+        logger.log(level, message, *args)
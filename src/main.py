@@ -1,8 +1,13 @@
+import argparse
+
 import pygame
 
+import auxil
 import log
 from cfg import std_cfg
 from gamestate import GameStateManager
+from profiler import profiler
+from replay import Replay
 
 
 def main() -> None:
@@ -11,6 +16,7 @@ def main() -> None:
     This function sets up the game by initializing Pygame, creating the game window,
     setting up the logger, and initializing the game state manager. It then enters
     an infinite loop where it updates the game state, draws the game screen, and updates the display.
+    Given a replay file, the replay is played back in the window instead of starting at the menu.
 
     Todo:
         * A song-ending mechanic
@@ -20,24 +26,37 @@ def main() -> None:
         * Linting and docstrings, cleanup in already done docstrings
 
     """
+    parser = argparse.ArgumentParser(description="Piano game")
+    parser.add_argument("--replay", help="Replay file to play back")
+    args = parser.parse_args()
+
+    auxil.init_mixer()
     pygame.init()
-    pygame.mixer.init()
     screen = pygame.display.set_mode((std_cfg.SCREEN_WIDTH, std_cfg.SCREEN_HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Piano game")
 
     log.setup_logger()
 
     manager = GameStateManager(screen)
+    if args.replay:
+        replay = Replay.load(args.replay)
+        manager.handle_state_transition("START_GAME", replay.chart, replay)
     clock = pygame.time.Clock()
 
     while True:
         dt = clock.tick(std_cfg.FPS) / 1000.0
+        profiler.begin_frame()
 
         manager.update(dt)
 
-        manager.draw()
+        dirty = manager.draw()
 
-        pygame.display.flip()
+        if dirty is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty)
+        profiler.lap("present")
+        profiler.end_frame()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import logging
 import sys
 from abc import ABC, abstractmethod
@@ -14,6 +13,7 @@ import ui
 from assets import MenuAssets
 from cfg import std_cfg
 from resource_path import resource_path
+from song_library import SongLibrary
 
 
 class BaseMenu(ABC):
@@ -31,6 +31,8 @@ class BaseMenu(ABC):
         self.title_font = auxil.get_sysfont(std_cfg.FONT, 48)
         self.layout = layout
         self.assets = assets
+        self.buttons: list[ui.Button] = []
+        self.back_button: ui.Button | None = None
 
     @abstractmethod
     def draw(self, screen: pygame.Surface) -> None:
@@ -44,6 +46,23 @@ class BaseMenu(ABC):
     def update_menu_ui(self, layout: ui.UIAuxil) -> None:
         """Update the menu UI based on the given layout configuration."""
 
+    def update_hover(self, pos: tuple[int, int]) -> bool:
+        """Update the hover state of every button in the menu.
+
+        Args:
+            pos (tuple[int, int]): The position of the mouse.
+
+        Returns:
+            bool: True if any button changed hover state, False otherwise.
+
+        """
+        changed = False
+        for button in self.buttons:
+            changed |= button.update_hover(pos)
+        if self.back_button:
+            changed |= self.back_button.update_hover(pos)
+        return changed
+
     def draw_title(self, screen: pygame.Surface, x_pos: float, y_pos: float, title: str) -> None:
         """Draws title of selected menu."""
         # Can be made abstract later if we need different titles
@@ -65,9 +84,8 @@ class MainMenu(BaseMenu):
         """
         super().__init__(assets, layout)
 
-        self.options = ["Play", "Tutorial", "Exit"]
+        self.options = ["Play", "Tutorial", "Calibrate", "Exit"]
         self.scaled_background = None
-        self.buttons = []
         button_y = self.layout.content_start_y
         for idx, name in enumerate(self.options):
             self.buttons.append(
@@ -121,6 +139,8 @@ class MainMenu(BaseMenu):
                         return "SHOW_SONG_SELECT", None
                     elif button.text == "Tutorial":
                         return "SHOW_OPTIONS", None
+                    elif button.text == "Calibrate":
+                        return "START_CALIBRATION", None
         return None, None
 
     def update_menu_ui(self, layout: ui.UIAuxil) -> None:
@@ -148,7 +168,12 @@ class MainMenu(BaseMenu):
 
 
 class SongSelectMenu(BaseMenu):
-    """Class for song selection menu. Inherits from BaseMenu."""
+    """Class for song selection menu. Inherits from BaseMenu.
+
+    The song list is virtualised, buttons are only created for the rows that fit on screen, and the list is
+    scrolled with the mouse wheel or the arrow keys.
+
+    """
 
     def __init__(self, assets: MenuAssets, layout: ui.UIAuxil) -> None:
         """Initialize the menu.
@@ -160,7 +185,8 @@ class SongSelectMenu(BaseMenu):
         """
         super().__init__(assets, layout)
         self.songs = []
-        self.buttons = []
+        self.scroll = 0
+        self.visible_rows = 1
         self.load_available_songs()
 
         self.back_button = ui.Button(
@@ -173,28 +199,24 @@ class SongSelectMenu(BaseMenu):
         self.scaled_background = None
 
     def load_available_songs(self) -> None:
-        """Load available songs from the songs directory."""
+        """Load the metadata of available songs from the song library index."""
         song_dir = Path(resource_path("songs/"))
         if not song_dir.exists():
             log.log_write("Songs dir not found", logging.CRITICAL)
 
-        song_files = [f for f in song_dir.iterdir() if str(f).endswith(".json")]
-
-        for file in song_files:
-            # with open(os.path.join(song_dir, file)) as f:
-            with file.open() as f:
-                song_data = json.load(f)
-                self.songs.append(
-                    {
-                        "filename": str(file),
-                        "title": song_data.get("title", file),
-                        "difficulty": song_data.get("difficulty", "Normal"),
-                        "bpm": song_data.get("bpm", std_cfg.BPM),
-                    },
-                )
+        self.songs = SongLibrary(song_dir, Path(std_cfg.SONG_INDEX_FILE)).scan()
+        self.build_visible_buttons()
 
+    def build_visible_buttons(self) -> None:
+        """Create buttons for the songs in the rows that are currently visible."""
+        row_height = self.font.get_height() + self.layout.pad_y
+        space = self.layout.content_end_y - self.layout.pad_y - self.layout.content_start_y
+        self.visible_rows = max(1, int(space // row_height))
+        self.scroll = max(0, min(self.scroll, len(self.songs) - self.visible_rows))
+
+        self.buttons = []
         button_y = self.layout.content_start_y
-        for idx, song in enumerate(self.songs):
+        for idx, song in enumerate(self.songs[self.scroll : self.scroll + self.visible_rows]):
             self.buttons.append(
                 ui.Button(
                     self.layout.x_center,
@@ -206,6 +228,19 @@ class SongSelectMenu(BaseMenu):
             )
             button_y = self.buttons[idx].rect.bottom + self.layout.pad_y
 
+    def scroll_by(self, rows: int) -> None:
+        """Scroll the song list.
+
+        Args:
+            rows (int): Number of rows to scroll, positive scrolls down.
+
+        """
+        scroll = max(0, min(self.scroll + rows, len(self.songs) - self.visible_rows))
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.build_visible_buttons()
+            self.update_hover(pygame.mouse.get_pos())
+
     def draw(self, screen: pygame.Surface) -> None:
         """Draw the menu on the given screen.
 
@@ -243,10 +278,21 @@ class SongSelectMenu(BaseMenu):
                 return "SHOW_MAIN_MENU", None
             for idx, button in enumerate(self.buttons):
                 if button.is_over(pos):
-                    return "START_GAME", self.songs[idx]["filename"]
+                    return "START_GAME", self.songs[self.scroll + idx]["filename"]
+        elif event.type == pygame.MOUSEMOTION:
+            # Start loading a song in the background as soon as it is hovered
+            for idx, button in enumerate(self.buttons):
+                if button.is_over(event.pos):
+                    return "PREFETCH_SONG", self.songs[self.scroll + idx]["filename"]
+        elif event.type == pygame.MOUSEWHEEL:
+            self.scroll_by(-event.y)
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
                 return "SHOW_MAIN_MENU", None
+            if event.key == pygame.K_DOWN:
+                self.scroll_by(1)
+            elif event.key == pygame.K_UP:
+                self.scroll_by(-1)
         return None, None
 
     def update_menu_ui(self, layout: ui.UIAuxil) -> None:
@@ -258,10 +304,8 @@ class SongSelectMenu(BaseMenu):
         """
         self.layout = layout
 
-        button_y = self.layout.content_start_y
-        for i, button in enumerate(self.buttons):
-            button.update(self.layout.x_center, button_y)
-            button_y = self.buttons[i].rect.bottom + self.layout.pad_y
+        # The number of visible rows depends on the screen height, so the buttons are rebuilt
+        self.build_visible_buttons()
 
         self.back_button.update(self.layout.x_center, self.layout.content_end_y)
 
@@ -291,7 +335,6 @@ class OptionsMenu(BaseMenu):
 
         self.scaled_background = None
 
-        self.buttons = []
         button_y = self.layout.content_start_y
         for idx, name in enumerate(self.text):
             self.buttons.append(
@@ -376,7 +419,12 @@ class OptionsMenu(BaseMenu):
 
 
 class MenuManager:
-    """Manages the different menus in the game."""
+    """Manages the different menus in the game.
+
+    The menus are only redrawn when needs_redraw is set, which happens on input, hover changes, menu swaps and
+    resizes. This lets the game loop sleep on the event queue while nothing changes.
+
+    """
 
     def __init__(self, layout: ui.UIAuxil, mediator: ui.Mediator) -> None:
         """Initialize the menu.
@@ -390,6 +438,7 @@ class MenuManager:
         self.menu_assets = MenuAssets()
         self.menu_assets.load()
         mediator.set_manager(self)
+        self.needs_redraw = True
 
         self.menus = {
             "main": MainMenu(self.menu_assets, self.layout),
@@ -404,6 +453,8 @@ class MenuManager:
         self.current_menu = self.menus[menu_name]
         # Update UI on swap in case it was changed in previous menu
         self.current_menu.update_menu_ui(self.layout)
+        self.current_menu.update_hover(pygame.mouse.get_pos())
+        self.needs_redraw = True
 
     def handle_input(self, event: pygame.event.Event) -> tuple:
         """Handle input through the current menu's own function.
@@ -417,13 +468,21 @@ class MenuManager:
             tuple: The action to take and any associated data.
 
         """
+        if event.type == pygame.MOUSEMOTION:
+            self.needs_redraw |= self.current_menu.update_hover(event.pos)
+        elif event.type != pygame.NOEVENT:
+            self.needs_redraw = True
+
         if self.current_menu:
             action, data = self.current_menu.handle_input(event)
             if action:
-                if action == "START_GAME":
+                if action in ("START_GAME", "PREFETCH_SONG", "START_CALIBRATION"):
                     return action, data
                 if action == "SHOW_MAIN_MENU":
+                    left_song_select = self.current_menu is self.menus["song_select"]
                     self.show_menu("main")
+                    if left_song_select:
+                        return "CANCEL_PREFETCH", None
                 elif action == "SHOW_SONG_SELECT":
                     self.show_menu("song_select")
                 elif action == "SHOW_OPTIONS":
@@ -433,15 +492,21 @@ class MenuManager:
                     sys.exit()
         return (None, None)
 
-    def draw(self, screen: pygame.Surface) -> None:
-        """Draw the menu through its own drawing function.
+    def draw(self, screen: pygame.Surface) -> bool:
+        """Draw the menu through its own drawing function if anything changed since the last draw.
 
         Args:
             screen (pygame.Surface): The display surface for the menu.
 
+        Returns:
+            bool: True if the menu was redrawn, False otherwise.
+
         """
-        if self.current_menu:
-            self.current_menu.draw(screen)
+        if not self.needs_redraw or not self.current_menu:
+            return False
+        self.current_menu.draw(screen)
+        self.needs_redraw = False
+        return True
 
     def update_manager_ui(self, layout: ui.UIAuxil) -> None:
         """Update the UI of the menu manager.
@@ -452,3 +517,5 @@ class MenuManager:
         """
         self.layout = layout
         self.current_menu.update_menu_ui(layout)
+        self.current_menu.update_hover(pygame.mouse.get_pos())
+        self.needs_redraw = True
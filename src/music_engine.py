@@ -1,22 +1,45 @@
 from __future__ import annotations
 
 import json
+import logging
 import sys
+from array import array
+from bisect import bisect_left, bisect_right
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import pygame
 
 import auxil
+import chart_format
+import log
+import pcm_cache
 from cfg import std_cfg
+from profiler import profiler
+from replay import Replay, ReplayPlayer, ReplayRecorder
 from resource_path import resource_path
+from song_clock import SongClock
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
     from assets import GameAssets
 
 
 class Note:
-    """A class representing a single note in a song."""
+    """A class representing a single note in a song.
+
+    Only holds the static chart data of the note, the render and judgement state of a spawned note lives in
+    ActiveNote. Uses __slots__ to keep large charts small in memory.
+
+    """
+
+    __slots__ = ("bar", "note_type", "pitch", "slot")
 
     def __init__(self, bar: int, slot: int, note_type: int, pitch: int) -> None:
         """Initialize a note with the given parameters.
@@ -33,17 +56,41 @@ class Note:
         self.note_type = note_type
         self.pitch = pitch
 
-        self.active = False
-        self.hit = False
+    def __repr__(self) -> str:
+        """Return a string representation of the note, mainly for debugging purposes."""
+        return f"Note(slot={self.slot}, type={self.note_type}, pitch={self.pitch})"
+
+
+class ActiveNote:
+    """The render and judgement state of a note that has been spawned on screen."""
 
-        self.rect: pygame.Rect | None = None
-        self.image: pygame.Surface | None = None
+    __slots__ = ("hit", "image", "note", "pitch", "rect", "score", "spawn_time", "x")
 
+    def __init__(self, note: Note, image: pygame.Surface, center_y: int, spawn_time: float) -> None:
+        """Initialize the state of a spawned note.
+
+        Args:
+            note (Note): The note from the song
+            image (pygame.Surface): The sprite of the note
+            center_y (int): y-coordinate of the center of the note on screen
+            spawn_time (float): The time the note was due to spawn
+
+        """
+        self.note = note
+        self.pitch = note.pitch
+        self.image = image
+
+        # Float position and spawn time are kept apart from the integer blit rect to avoid drift
+        self.x = float(std_cfg.NOTE_SPAWN_X)
+        self.spawn_time = spawn_time
+        self.rect = image.get_rect(center=(std_cfg.NOTE_SPAWN_X, center_y))
+
+        self.hit = False
         self.score = 0
 
     def __repr__(self) -> str:
-        """Return a string representation of the note, mainly for debugging purposes."""
-        return f"Note(slot={self.slot}, type={self.note_type}, pitch={self.pitch})"
+        """Return a string representation of the active note, mainly for debugging purposes."""
+        return f"ActiveNote({self.note!r}, x={self.x:.1f}, hit={self.hit})"
 
 
 class Song:
@@ -51,10 +98,16 @@ class Song:
 
     Methods:
         add_note: Add a note to the song
+        add_notes: Add many notes to the song at once
         remove_note: Remove a note from the song
+        from_file: Create a Song object from a JSON or binary chart file
         from_json: Create a Song object from a JSON file
+        from_binary: Create a Song object from a binary chart file
         get_notes_for_time: Get all notes for a given slot + bar combination
 
+    Notes are kept sorted by bar and slot, with a compact array of their time keys next to them. Looking up the
+    notes of a slot is a binary search instead of a scan over the whole song, and the index costs 8 bytes per note.
+
     """
 
     def __init__(
@@ -73,9 +126,26 @@ class Song:
         """
         self.bpm = bpm
         self.slots_per_bar = slots_per_bar
-        self.notes = []
+        self.notes: list[Note] = []
         self.b_path = b_path
 
+        # Time key of every note in self.notes, in the same sorted order
+        self.note_keys = array("Q")
+
+    @staticmethod
+    def time_key(bar: int, slot: int) -> int:
+        """Get the key notes are sorted by, which orders by bar first and slot second.
+
+        Args:
+            bar (int): Bar number in song
+            slot (int): Slot within the bar
+
+        Returns:
+            int: The time key
+
+        """
+        return (bar << 16) | slot
+
     def add_note(self, bar: int, slot: int, note_type: int, pitch: int) -> None:
         """Add a note to the song.
 
@@ -86,7 +156,22 @@ class Song:
             pitch (int): Pitch of the note
 
         """
-        self.notes.append(Note(bar, slot, note_type, pitch))
+        key = self.time_key(bar, slot)
+        index = bisect_right(self.note_keys, key)
+        self.notes.insert(index, Note(bar, slot, note_type, pitch))
+        self.note_keys.insert(index, key)
+
+    def add_notes(self, notes: Iterable[tuple[int, int, int, int]]) -> None:
+        """Add many notes to the song at once, sorting once instead of inserting each note.
+
+        Args:
+            notes (Iterable[tuple[int, int, int, int]]): Bar, slot, note type and pitch of each note
+
+        """
+        self.notes.extend(Note(bar, slot, note_type, pitch) for bar, slot, note_type, pitch in notes)
+        # Stable sort, so notes in the same slot keep their order, and close to linear for charts already in order
+        self.notes.sort(key=lambda note: self.time_key(note.bar, note.slot))
+        self.note_keys = array("Q", [self.time_key(note.bar, note.slot) for note in self.notes])
 
     def remove_note(self, note: Note) -> None:
         """Remove a note from the song.
@@ -95,8 +180,56 @@ class Song:
             note (Note): Note to remove
 
         """
-        if note in self.notes:
-            self.notes.remove(note)
+        key = self.time_key(note.bar, note.slot)
+        for index in range(bisect_left(self.note_keys, key), bisect_right(self.note_keys, key)):
+            if self.notes[index] is note:
+                del self.notes[index]
+                del self.note_keys[index]
+                return
+
+    @classmethod
+    def from_file(cls, filepath: str) -> Song:
+        """Create a Song object from a chart file in either the JSON or the binary chart format.
+
+        Args:
+            filepath (str): Path to the chart file
+
+        Returns:
+            Song: A Song object created from the chart file
+
+        """
+        if chart_format.is_binary(filepath):
+            return cls.from_binary(filepath)
+        return cls.from_json(filepath)
+
+    @classmethod
+    def from_binary(cls, filepath: str) -> Song:
+        """Create a Song object from a binary chart file.
+
+        With NumPy the notes and their time keys are built straight from the columns of the mapped records. Binary
+        charts are stored sorted, so nothing is sorted. A Note object is still made per record, since the note
+        managers and the active notes work on Note objects.
+
+        Args:
+            filepath (str): Path to the binary chart file
+
+        Returns:
+            Song: A Song object created from the binary chart file
+
+        """
+        data = chart_format.read_binary(filepath)
+        song = cls(data["bpm"], data["slots_per_bar"], data["b_path"])
+        records = data["notes"]
+        if np is None:
+            song.add_notes(records)
+            return song
+        bars = records["bar"]
+        slots = records["slot"]
+        song.notes = list(
+            map(Note, bars.tolist(), slots.tolist(), records["note_type"].tolist(), records["pitch"].tolist()),
+        )
+        song.note_keys = array("Q", ((bars.astype(np.uint64) << 16) | slots).tobytes())
+        return song
 
     @classmethod
     def from_json(cls, filepath: str) -> Song:
@@ -113,13 +246,10 @@ class Song:
             data = json.load(f)
         b_path = data.get("b_path", None)
         song = cls(data["bpm"], data["slots_per_bar"], b_path)
-        for note_data in data["notes"]:
-            song.add_note(
-                note_data["bar"],
-                note_data["slot"],
-                note_data["note_type"],
-                note_data["pitch"],
-            )
+        song.add_notes(
+            (note_data["bar"], note_data["slot"], note_data["note_type"], note_data["pitch"])
+            for note_data in data["notes"]
+        )
         return song
 
     def get_notes_for_time(self, bar: int, slot: int) -> list[Note]:
@@ -133,7 +263,8 @@ class Song:
             list[Note]: List of notes for the given slot + bar combination
 
         """
-        return [note for note in self.notes if note.bar == bar and note.slot == slot]
+        key = self.time_key(bar, slot)
+        return self.notes[bisect_left(self.note_keys, key) : bisect_right(self.note_keys, key)]
 
     def __repr__(self) -> str:
         """Return a string representation of the song, mainly for debugging purposes."""
@@ -151,81 +282,297 @@ class MusicPlayer:
 
     def __init__(
         self,
-        song: str,
+        song: Song,
         assets: GameAssets,
         play_center: float,
         play_margain: float,
         play_b_time: float,
+        b_track: pygame.mixer.Sound | StreamedBTrack | None = None,
+        input_offset: float = 0.0,
+        clock: SongClock | None = None,
+        replay: Replay | None = None,
     ) -> None:
         """Initialize the music player.
 
         Args:
-            song (str): The file path for the song selected.
+            song (Song): The song selected.
             assets (GameAssets): The assets used in the game.
             play_center (float): x-coordinate of the center of the play area
             play_margain (float): Width of the play area
             play_b_time (float): When to start playing the b-track to match with notes
+            b_track (pygame.mixer.Sound | StreamedBTrack | None, optional): Already loaded b-track for the song.
+                Defaults to None, in which case it is loaded from the song's b_path.
+            input_offset (float, optional): Measured delay in seconds from seeing a note until the press for it
+                arrives, subtracted from press times before judging. Defaults to 0.0.
+            clock (SongClock | None, optional): The clock all managers read song time from. Defaults to None, in
+                which case a new clock starts now.
+            replay (Replay | None, optional): Replay to play back instead of taking keys from the keyboard.
+                Defaults to None, in which case the key events of the player are recorded.
 
         """
         self.assets = assets
-        self.song = Song.from_json(song)
+        self.song = song
+        self.input_offset = input_offset
         self.play_center = play_center
         self.play_margain = play_margain
         self.play_b_time = play_b_time
 
-        self.start_time = pygame.time.get_ticks() / 1000.0
+        self.clock = clock or SongClock()
 
-        self.note_manager = NoteManager(self.song, self.assets, self.play_margain, self.play_center)
-        self.audio_manager = AudioManager(self.song, self.assets, self.play_b_time)
-        self.input_handler = InputHandler()
+        if std_cfg.NOTE_ENGINE == "numpy" and np is not None:
+            self.note_manager = ArrayNoteManager(self.song, self.assets, self.play_margain, self.play_center)
+        else:
+            if std_cfg.NOTE_ENGINE == "numpy":
+                log.log_write("NumPy not available, falling back to object note engine", logging.WARNING)
+            self.note_manager = NoteManager(self.song, self.assets, self.play_margain, self.play_center)
+        self.audio_manager = AudioManager(self.song, self.assets, self.play_b_time, self.clock, b_track)
+        self.input_handler = InputHandler(self.clock)
 
-        self.key_state = dict.fromkeys(auxil.keys, False)
+        self.key_state = self.input_handler.key_state
         self.score = 0
+        self.recorder = ReplayRecorder() if std_cfg.RECORD_REPLAYS and not replay else None
+        self.replay_player = ReplayPlayer(replay) if replay else None
+        # Ticked once per drawn frame, only to measure the frame rate shown in debug mode
+        self.fps_clock = pygame.time.Clock()
 
-    def update(self, dt: float) -> str | None:
+    def update(self, dt: float, events: Iterable[pygame.event.Event] | None = None) -> str | None:
         """Update the musicplayer.
 
         Args:
             dt (float): Time since last update
+            events (Iterable[pygame.event.Event] | None, optional): Input events to handle. Defaults to None, in
+                which case they are taken from the pygame event queue.
 
         Returns:
             str | None: Status of the game, such as "QUIT_TO_MENU" or None
 
         """
-        self.key_state = self.input_handler.check_keyboard()
-        status = self.input_handler.handle_input(self.audio_manager.b_track, b_playing=self.audio_manager.b_playing)
+        self.clock.sync()
+        if events is None and self.replay_player:
+            events = self.replay_player.poll(self.clock.now())
+        status = self.input_handler.handle_input(
+            self.audio_manager.b_track,
+            b_playing=self.audio_manager.b_playing,
+            on_key=self.on_key,
+            events=events,
+        )
+        profiler.lap("input")
+
+        current_time = self.clock.now()
+        self.note_manager.check_note_spawn(current_time)
+        profiler.lap("spawn")
+        self.score += self.note_manager.update_notes(current_time)
+        profiler.lap("notes")
+
+        self.audio_manager.play_b_track(current_time)
+        profiler.lap("audio")
 
-        self.note_manager.check_note_hit(self.key_state, self.input_handler.octave)
-        self.note_manager.check_note_spawn()
-        self.score += self.note_manager.update_notes(dt)
+        return status
 
-        self.audio_manager.play_notes(self.key_state, self.input_handler.octave)
-        self.audio_manager.play_b_track(self.start_time)
+    def on_key(self, key: int, octave: int, event_time: float, *, pressed: bool) -> None:
+        """Play or release the note of a key and judge presses, called for each key event as it is handled.
 
-        return status
+        Args:
+            key (int): The key that was pressed or released
+            octave (int): The octave of the keyboard when the event happened
+            event_time (float): The song time of the event in seconds
+            pressed (bool): True if the key was pressed, False if it was released
 
-    def draw(self, screen: pygame.Surface) -> None:
+        """
+        if self.recorder:
+            self.recorder.record(event_time, key, octave, pressed=pressed)
+        if pressed:
+            self.audio_manager.note_on(key, octave)
+            self.note_manager.judge_press(key, octave, event_time - self.input_offset)
+        else:
+            self.audio_manager.note_off(key)
+
+    def stop(self) -> None:
+        """Stop the b-track if it is playing and every sounding note."""
+        if self.audio_manager.b_track:
+            self.audio_manager.b_track.stop()
+        self.audio_manager.voices.stop()
+
+    def draw(self, screen: pygame.Surface) -> list[pygame.Rect]:
         """Draw the notes.
 
         Args:
             screen (pygame.Surface): The display surface for the game.
 
+        Returns:
+            list[pygame.Rect]: The areas of the screen that were drawn on.
+
         """
-        self.note_manager.draw(screen)
-        auxil.display_score(self.score, screen, auxil.BLACK)
+        dirty = self.note_manager.draw(screen)
+        profiler.lap("note_sprites")
+        dirty.append(auxil.display_score(self.score, screen, auxil.BLACK))
 
         for key, is_pressed in self.key_state.items():
             if is_pressed:
                 index = auxil.keys.index(key)
-                pygame.draw.circle(
-                    screen,
-                    auxil.RED,
-                    (self.play_center, 220 - (index + (self.input_handler.octave - 5) * 7) * 10),
-                    5,
+                dirty.append(
+                    pygame.draw.circle(
+                        screen,
+                        auxil.RED,
+                        (self.play_center, 220 - (index + (self.input_handler.octave - 5) * 7) * 10),
+                        5,
+                    ),
                 )
 
+        self.fps_clock.tick()
         if std_cfg.DEBUG_MODE:
-            auxil.display_fps(pygame.time.Clock(), screen, auxil.BLACK)
+            dirty.append(auxil.display_fps(self.fps_clock, screen, auxil.BLACK))
+        profiler.lap("hud")
+
+        overlay = profiler.draw_overlay(screen)
+        if overlay:
+            dirty.append(overlay)
+        profiler.lap("overlay")
+
+        return dirty
+
+
+class StreamedBTrack:
+    """A b-track played through pygame.mixer.music, which decodes it in small chunks while playing.
+
+    Has the same play, stop and set_volume interface as the pygame.mixer.Sound used for fully decoded b-tracks,
+    but costs constant memory and does not stall on decoding the whole file before playing.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the streamed b-track.
+
+        Args:
+            path (str): Path to the audio file of the b-track
+
+        """
+        self.path = path
+        self.volume = 1.0
+
+    def set_volume(self, volume: float) -> None:
+        """Set the volume of the b-track.
+
+        Args:
+            volume (float): Volume between 0.0 and 1.0
+
+        """
+        self.volume = volume
+        pygame.mixer.music.set_volume(volume)
+
+    def play(self) -> None:
+        """Start streaming the b-track from the beginning."""
+        pygame.mixer.music.load(self.path)
+        pygame.mixer.music.set_volume(self.volume)
+        pygame.mixer.music.play()
+
+    def stop(self) -> None:
+        """Stop the b-track and release the stream."""
+        pygame.mixer.music.stop()
+        pygame.mixer.music.unload()
+
+    def get_pos(self) -> float | None:
+        """Get how far the mixer has played into the b-track.
+
+        Returns:
+            float | None: Playback position in seconds, or None if the b-track is not playing.
+
+        """
+        position = pygame.mixer.music.get_pos()
+        if position < 0:
+            return None
+        return position / 1000.0
+
+
+class VoiceManager:
+    """Plays note sounds on a fixed pool of reserved mixer channels, one note per channel (voice).
+
+    The first channel is reserved for a fully decoded b-track, so notes can never cut it off, followed by NOTE_VOICES
+    channels for notes. When every voice is sounding, the voice that started longest ago is taken over. Voices are
+    looked up by note number in flat arrays, so starting and releasing a note does not depend on how many notes
+    there are.
+
+    Methods:
+        play: Play a note on a free voice, or on the oldest voice if none is free
+        release: Fade out the voice of a note
+        is_sounding: Check whether a note holds a voice
+        stop: Stop every voice
+
+    """
+
+    B_TRACK_CHANNEL = 0
+
+    def __init__(self, voices: int = std_cfg.NOTE_VOICES) -> None:
+        """Size the mixer channel pool and reserve the b-track and note channels.
+
+        Args:
+            voices (int, optional): Number of notes that can sound at once. Defaults to std_cfg.NOTE_VOICES.
+
+        """
+        reserved = voices + 1
+        pygame.mixer.set_num_channels(reserved + std_cfg.MIXER_SPARE_CHANNELS)
+        pygame.mixer.set_reserved(reserved)
+        self.b_track_channel = pygame.mixer.Channel(self.B_TRACK_CHANNEL)
+        self.channels = [pygame.mixer.Channel(channel) for channel in range(1, reserved)]
+        # Note number held by each voice (-1 for none) and when it started, counted in notes played
+        self.voice_note = array("i", [-1] * voices)
+        self.voice_started = array("Q", [0] * voices)
+        # Voice held by each note number, -1 for none
+        self.note_voice = array("i", [-1] * 128)
+        self.notes_played = 0
+
+    def play(self, note: int, sound: pygame.mixer.Sound) -> None:
+        """Play a note on an idle voice, or take over the oldest voice if none is idle.
+
+        Args:
+            note (int): Note number of the note
+            sound (pygame.mixer.Sound): Sound of the note
+
+        """
+        voice = next((i for i, channel in enumerate(self.channels) if not channel.get_busy()), -1)
+        if voice < 0:
+            voice = min(range(len(self.channels)), key=self.voice_started.__getitem__)
+        old_note = self.voice_note[voice]
+        if old_note >= 0 and self.note_voice[old_note] == voice:
+            self.note_voice[old_note] = -1
+
+        self.channels[voice].play(sound)
+        self.voice_note[voice] = note
+        self.notes_played += 1
+        self.voice_started[voice] = self.notes_played
+        self.note_voice[note] = voice
+
+    def release(self, note: int) -> None:
+        """Fade out the voice of a note, leaving the voice to be taken over once it has faded.
+
+        Args:
+            note (int): Note number of the note
+
+        """
+        voice = self.note_voice[note]
+        if voice < 0:
+            return
+        self.channels[voice].fadeout(std_cfg.FADEOUT)
+        self.note_voice[note] = -1
+
+    def is_sounding(self, note: int) -> bool:
+        """Check whether a note holds a voice and has not been released.
+
+        Args:
+            note (int): Note number of the note
+
+        Returns:
+            bool: True if the note is sounding
+
+        """
+        return self.note_voice[note] >= 0
+
+    def stop(self) -> None:
+        """Stop every voice."""
+        for channel in self.channels:
+            channel.stop()
+        self.voice_note = array("i", [-1] * len(self.channels))
+        self.note_voice = array("i", [-1] * 128)
 
 
 class AudioManager:
@@ -233,77 +580,118 @@ class AudioManager:
 
     Methods:
         play_b_track: Play the b-track of the song
-        play_notes: Play notes when keys are pressed
+        note_on: Play the note of a pressed key
+        note_off: Fade out the note of a released key
 
     """
 
-    def __init__(self, song: Song, assets: GameAssets, play_b_time: float | None) -> None:
+    def __init__(
+        self,
+        song: Song,
+        assets: GameAssets,
+        play_b_time: float | None,
+        clock: SongClock,
+        b_track: pygame.mixer.Sound | StreamedBTrack | None = None,
+    ) -> None:
         """Initilize audio manager.
 
         Args:
             song (Song): Song object being played
             assets (GameAssets): Assets object containing audio for notes
-            play_b_time (float): When to start playing the b-track
+            play_b_time (float): Song time to start playing the b-track at
+            clock (SongClock): The song clock, disciplined by the b-track once it streams
+            b_track (pygame.mixer.Sound | StreamedBTrack | None, optional): Already loaded b-track.
+                Defaults to None.
 
         """
         self.song = song
         self.play_b_time = play_b_time
+        self.clock = clock
         self.b_playing = False
 
         self.assets = assets
 
-        self.b_track = None
-        if self.song.b_path:
-            self.b_track = pygame.mixer.Sound(resource_path("audio/" + self.song.b_path))
-            self.b_track.set_volume(std_cfg.B_TRACK_VOL)
+        self.b_track = b_track or self.load_b_track(self.song)
+
+        self.voices = VoiceManager()
+        # The note number sounding for each held physical key
+        self.held: dict[int, int] = {}
+
+        # Get the sound of every note in the song once, so a synthesised instrument generates them before playing
+        for pitch in {note.pitch for note in self.song.notes}:
+            self.assets.note_sounds.get(auxil.pitch_note_number(pitch))
+
+    @staticmethod
+    def load_b_track(song: Song) -> pygame.mixer.Sound | StreamedBTrack | None:
+        """Load the b-track of a song, either streamed or fully decoded depending on B_TRACK_STREAM.
 
-        self.playing = {
-            octave_key: dict.fromkeys(self.assets.note_sounds[octave_key], False)
-            for octave_key in self.assets.note_sounds
-        }
+        Args:
+            song (Song): The song to load the b-track for
+
+        Returns:
+            pygame.mixer.Sound | StreamedBTrack | None: The b-track, or None if the song has no b-track
 
-    def play_b_track(self, start_time: float) -> None:
+        """
+        if not song.b_path:
+            return None
+        if std_cfg.B_TRACK_STREAM:
+            b_track = StreamedBTrack(resource_path("audio/" + song.b_path))
+        else:
+            b_track = pcm_cache.load_sound(resource_path("audio/" + song.b_path))
+        b_track.set_volume(std_cfg.B_TRACK_VOL)
+        return b_track
+
+    def play_b_track(self, current_time: float) -> None:
         """Play the b-track of the song if enough time has passed and it is not already playing.
 
+        A streamed b-track can report its position, so from then on the song clock follows it. A fully decoded
+        b-track plays on its own reserved channel.
+
         Args:
-            start_time (float): The time when the game started a song
+            current_time (float): The current song time in seconds
 
         """
-        current_time = pygame.time.get_ticks() / 1000.0
         if self.b_track is None:
             return
         play_time = self.play_b_time or 0.0
-        if current_time - start_time >= play_time and not self.b_playing:
+        if current_time >= play_time and not self.b_playing:
             self.b_playing = True
-            self.b_track.play()
+            if isinstance(self.b_track, StreamedBTrack):
+                self.b_track.play()
+                self.clock.follow(self.b_track, current_time)
+            else:
+                self.voices.b_track_channel.play(self.b_track)
 
-    def play_notes(self, key_state: dict[int, bool], octave: int) -> None:
-        """Play notes according to keys that are pressed.
+    def note_on(self, physical_key: int, octave: int) -> None:
+        """Start the note of a pressed key right away.
 
         Args:
-            key_state (dict[str, bool]): Dictionary of key states
+            physical_key (int): The key that was pressed
             octave (int): The current octave of the keyboard
 
         """
-        for physical_key, is_pressed in key_state.items():
-            note_key = physical_key
-            note_octave = octave
-            if note_key == pygame.K_k:
-                note_octave = note_octave + 1
-                note_key = pygame.K_a
+        semitone = auxil.key_semitones.get(physical_key)
+        if semitone is None:
+            return
+        note = auxil.note_number(octave, semitone)
+        sound = self.assets.note_sounds.get(note)
+        if sound is None:
+            return
+        self.held[physical_key] = note
+        if not self.voices.is_sounding(note):
+            self.voices.play(note, sound)
+
+    def note_off(self, physical_key: int) -> None:
+        """Fade out the note of a released key, unless another held key plays the same note.
 
-            if is_pressed and self.playing[str(note_octave)][note_key] is False:
-                self.assets.note_sounds[str(note_octave)][note_key].play()
-                self.playing[str(note_octave)][note_key] = True
-            elif not is_pressed:
-                for octave_key in self.assets.note_sounds:
-                    if self.playing[octave_key][note_key]:
-                        # Only fade out if not played by other key
-                        if note_key == pygame.K_a and (key_state[pygame.K_a] or key_state[pygame.K_k]):
-                            pass
-                        else:
-                            self.assets.note_sounds[octave_key][note_key].fadeout(std_cfg.FADEOUT)
-                            self.playing[octave_key][note_key] = False
+        Args:
+            physical_key (int): The key that was released
+
+        """
+        note = self.held.pop(physical_key, None)
+        if note is None or note in self.held.values():
+            return
+        self.voices.release(note)
 
 
 class InputHandler:
@@ -311,28 +699,50 @@ class InputHandler:
 
     Can possibly add octave changer here eventually.
 
+    Key presses and releases of playable keys are consumed as events instead of polling the keyboard once per frame,
+    and each one is passed on with its own song time as soon as it is handled. Events played back from a replay
+    carry the song time and octave they were recorded with, which are used instead.
+
     Methods:
-        handle_input: Handle input during a song, such as changing octave or quitting
-        check_keyboard: Check the state of the keyboard
+        handle_input: Handle input during a song, such as playing keys, changing octave or quitting
 
     """
 
-    def __init__(self) -> None:
-        """Set the initial octave to 5."""
+    def __init__(self, clock: SongClock) -> None:
+        """Set the initial octave to 5.
+
+        Args:
+            clock (SongClock): The song clock key events are timed with
+
+        """
+        self.clock = clock
         self.octave = 5
+        # Dictionary of key states, where the key is the key name and the value is True if pressed
+        self.key_state = dict.fromkeys(auxil.keys, False)
 
-    def handle_input(self, b_track: pygame.mixer.Sound | None, *, b_playing: bool) -> str | None:
+    def handle_input(
+        self,
+        b_track: pygame.mixer.Sound | StreamedBTrack | None,
+        *,
+        b_playing: bool,
+        on_key: Callable[..., None],
+        events: Iterable[pygame.event.Event] | None = None,
+    ) -> str | None:
         """Handle input during a song.
 
         Args:
             b_playing (bool): Whether the b-track is playing
-            b_track (pygame.mixer.Sound): The b-track sound object
+            b_track (pygame.mixer.Sound | StreamedBTrack): The b-track sound object
+            on_key (Callable): Called as on_key(key, octave, event_time, pressed=...) for every press or release
+                of a playable key, in the order they happened
+            events (Iterable[pygame.event.Event] | None, optional): Events to handle. Defaults to None, in which
+                case they are taken from the pygame event queue.
 
         Returns:
             str | None: Status of the game, such as "QUIT_TO_MENU" or None
 
         """
-        for event in pygame.event.get():
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -341,21 +751,32 @@ class InputHandler:
                     if b_playing and b_track:
                         b_track.stop()
                     return "QUIT_TO_MENU"
+                if event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                elif event.key == pygame.K_F4:
+                    profiler.dump_csv()
+                if event.key in self.key_state and not self.key_state[event.key]:
+                    self.key_state[event.key] = True
+                    on_key(event.key, *self.event_stamp(event), pressed=True)
+            elif event.type == pygame.KEYUP and self.key_state.get(event.key):
+                self.key_state[event.key] = False
+                on_key(event.key, *self.event_stamp(event), pressed=False)
         return None
 
-    def check_keyboard(self) -> dict:
-        """Check the state of the keyboard.
+    def event_stamp(self, event: pygame.event.Event) -> tuple[int, float]:
+        """Get the octave and song time of a key event.
+
+        Args:
+            event (pygame.event.Event): The key event
 
         Returns:
-            dict: Dictionary of key states, where the key is the key name and the value is True if pressed,
-            False otherwise
+            tuple[int, float]: The octave and song time recorded with a replayed event, otherwise the current ones
 
         """
-        key_state = dict.fromkeys(auxil.keys, False)
-        pressed_keys = pygame.key.get_pressed()
-        for key in auxil.keys:
-            key_state[key] = pressed_keys[key]
-        return key_state
+        song_time = getattr(event, "song_time", None)
+        if song_time is None:
+            return self.octave, self.clock.now()
+        return event.octave, song_time
 
 
 class NoteManager:
@@ -380,98 +801,335 @@ class NoteManager:
         self.song = song
         self.assets = assets
 
-        self.active_notes = []
+        self.active_notes: list[ActiveNote] = []
         self.current_slot = -1  # because we only check on update
         self.current_bar = 0
         self.time_per_slot = 60 / (self.song.bpm * self.song.slots_per_bar / std_cfg.BEATS_PER_BAR)
-        self.last_update_time = pygame.time.get_ticks() / 1000.0
+        # Song time starts at 0 on the song clock
+        self.start_time = 0.0
+        # Number of slots spawned since start, slot n is due at start_time + (n + 1) * time_per_slot
+        self.slots_spawned = 0
+        # Number of slots up to and including the last one with notes
+        last_note = self.song.notes[-1] if self.song.notes else None
+        self.total_slots = (last_note.bar - 1) * self.song.slots_per_bar + last_note.slot if last_note else 0
+        # (bar, slot, pitch, score) of every note that left the screen, in the order they left. Score 0 is a miss.
+        self.results: list[tuple[int, int, int, int]] = []
 
         self.play_margain = play_margain
         self.play_center = play_center
 
-    def check_note_spawn(self) -> None:
-        """Check if delta t is enough to update slot and bar. Also spawn notes when updating."""
-        current_time = pygame.time.get_ticks() / 1000.0
-        if current_time - self.last_update_time >= self.time_per_slot:
+    def is_finished(self) -> bool:
+        """Check whether every note of the song has been spawned and has left the screen.
+
+        Returns:
+            bool: True if the song has no notes left to play
+
+        """
+        return self.slots_spawned >= self.total_slots and not self.active_notes
+
+    def check_note_spawn(self, current_time: float) -> None:
+        """Advance slot and bar to the current time, spawning notes for every slot that came due.
+
+        All slots that came due since the last call are spawned, so a long frame does not leave the notes
+        behind the b-track.
+
+        Args:
+            current_time (float): The current song time in seconds
+
+        """
+        due_slots = int((current_time - self.start_time) / self.time_per_slot)
+        while self.slots_spawned < due_slots:
             if (self.current_slot + 1) % self.song.slots_per_bar < self.current_slot:
                 self.current_bar += 1
             self.current_slot = (self.current_slot + 1) % self.song.slots_per_bar
-            self.last_update_time += self.time_per_slot
-            self.spawn_note()
+            self.slots_spawned += 1
+            self.spawn_note(self.start_time + self.slots_spawned * self.time_per_slot)
+
+    def spawn_note(self, spawn_time: float) -> None:
+        """Spawn notes for the current slot and bar.
+
+        Args:
+            spawn_time (float): The time the current slot was due, used to place the notes
 
-    def spawn_note(self) -> None:
-        """Spawn notes for the current slot and bar."""
+        """
         notes = self.song.get_notes_for_time(self.current_bar + 1, self.current_slot + 1)
         for note in notes:
-            if note.active is False:
-                if note.pitch >= std_cfg.NOTE_MIRROR:
-                    note.image = pygame.transform.flip(
-                        self.assets.note_pictures[str(note.note_type)],
-                        flip_x=True,
-                        flip_y=True,
-                    )
-                    note.rect = note.image.get_rect(center=(1200, 260 - note.pitch * 10))
-                elif note.pitch == 0:
-                    note.image = self.assets.note_pictures_help[str(note.note_type)]
-                    note.rect = note.image.get_rect(center=(1200, 180 - note.pitch * 10))
-                else:
-                    note.image = self.assets.note_pictures[str(note.note_type)]
-                    note.rect = note.image.get_rect(center=(1200, 180 - note.pitch * 10))
-                note.active = True
-                self.active_notes.append(note)
-
-    def update_notes(self, dt: float) -> float:
+            image, center_y = self.get_note_image(note)
+            self.active_notes.append(ActiveNote(note, image, center_y, spawn_time))
+
+    def get_note_image(self, note: Note) -> tuple[pygame.Surface, int]:
+        """Get the picture of a note and the y-coordinate of its center.
+
+        Args:
+            note (Note): The note to get the picture for
+
+        Returns:
+            tuple[pygame.Surface, int]: The picture of the note and the y-coordinate of its center
+
+        """
+        image = self.assets.get_note_sprite(note.note_type, note.pitch)
+        if note.pitch >= std_cfg.NOTE_MIRROR:
+            return image, 260 - note.pitch * 10
+        return image, 180 - note.pitch * 10
+
+    def update_notes(self, current_time: float) -> float:
         """Update note positions on the screen, and remove notes that have been hit or are out of bounds.
 
+        Positions are derived from the time since each note spawned, so they do not drift with frame time.
+
         Args:
-            dt (float): Time since last update
+            current_time (float): The current song time in seconds
+
+        Returns:
+            float: Score of the notes removed this update
 
         """
         score = 0
-        to_remove = [note for note in self.active_notes if note.hit or note.rect.x < std_cfg.PLAY_AREA_Y]
-        for note in to_remove:
-            score += note.score
-            self.active_notes.remove(note)
+        remaining = []
         for note in self.active_notes:
-            note.rect.x -= dt * std_cfg.NOTE_VELOCITY
+            if note.hit or note.rect.x < std_cfg.PLAY_AREA_Y:
+                score += note.score
+                self.results.append((note.note.bar, note.note.slot, note.pitch, note.score))
+            else:
+                remaining.append(note)
+        self.active_notes = remaining
+        for note in self.active_notes:
+            note.x = std_cfg.NOTE_SPAWN_X - (current_time - note.spawn_time) * std_cfg.NOTE_VELOCITY
+            note.rect.centerx = round(note.x)
         return score
 
-    def check_note_hit(self, key_state: dict, octave: int) -> None:
-        """Check whether any notes in the active_notes list have been hit.
+    def score_for_distance(self, distance: float) -> int:
+        """Get the score of a hit from its distance to the center of the play area.
 
         Args:
-            key_state (dict): _description_
-            octave (int): _description_
+            distance (float): Distance in pixels between the note and the center of the play area
 
         Returns:
-            tuple[bool, int]: _description_
+            int: The score of the hit
 
         """
+        return 1000 if distance < self.play_margain / 3 else 500 if distance < self.play_margain / 2 else 100
+
+    def judge_press(self, key: int, octave: int, press_time: float) -> None:
+        """Judge a key press against the notes on screen at the exact time of the press.
+
+        Note positions are computed for the press time instead of taken from the last frame. Of the notes for the
+        key that are inside the play area, the one closest to its center is hit.
+
+        Args:
+            key (int): The key that was pressed
+            octave (int): The octave of the keyboard when the key was pressed
+            press_time (float): The song time of the press in seconds
+
+        """
+        if key not in auxil.keys:
+            return
+        index = auxil.keys.index(key)
+        best_note = None
+        best_distance = 0.0
         for note in self.active_notes:
-            if note.hit or not (
-                self.play_center - self.play_margain <= note.rect.centerx <= self.play_center + self.play_margain
-            ):
+            if note.hit or note.pitch % 8 != index or (note.pitch // 8) + std_cfg.MIN_OCTAVE != octave:
                 continue
-            for key, playing in key_state.items():
-                if (
-                    playing
-                    and auxil.key_dictionary[note.pitch % 8] == key
-                    and (note.pitch // 8) + std_cfg.MIN_OCTAVE == octave
-                ):
-                    distance = abs(note.rect.centerx - self.play_center)
-                    note.score = (
-                        1000 if distance < self.play_margain / 3 else 500 if distance < self.play_margain / 2 else 100
-                    )
-                    note.hit = True
-
-    def draw(self, screen: pygame.Surface) -> None:
+            x = std_cfg.NOTE_SPAWN_X - (press_time - note.spawn_time) * std_cfg.NOTE_VELOCITY
+            distance = abs(x - self.play_center)
+            if distance <= self.play_margain and (best_note is None or distance < best_distance):
+                best_note = note
+                best_distance = distance
+        if best_note:
+            best_note.score = self.score_for_distance(best_distance)
+            best_note.hit = True
+
+    def draw(self, screen: pygame.Surface) -> list[pygame.Rect]:
         """Draw the notes on the screen.
 
         Args:
             screen (pygame.Surface): The display surface for the game.
 
+        Returns:
+            list[pygame.Rect]: The areas of the screen that were drawn on.
+
         """
+        dirty = []
         for note in self.active_notes:
-            screen.blit(note.image, note.rect)
+            dirty.append(screen.blit(note.image, note.rect))
             if std_cfg.DEBUG_MODE:
                 pygame.draw.circle(screen, auxil.RED, (note.rect.centerx, note.rect.centery), 5)
+        return dirty
+
+
+class ArrayNoteManager(NoteManager):
+    """A note manager that keeps the active notes in NumPy columns instead of a list of note objects.
+
+    Movement, culling, hit checks and scoring are each done as one vectorised operation over all active notes,
+    which keeps the per-frame cost flat for dense charts. Requires NumPy.
+
+    """
+
+    INITIAL_CAPACITY = 64
+    # Column name and dtype of every per-note attribute
+    COLUMNS = {
+        "x": "float64",
+        "spawn_time": "float64",
+        "bar": "int32",
+        "slot": "int32",
+        "center_y": "int32",
+        "half_width": "int32",
+        "half_height": "int32",
+        "pitch": "int32",
+        "note_type": "int32",
+        "hit": "bool",
+        "score": "int32",
+    }
+
+    def __init__(self, song: Song, assets: GameAssets, play_margain: float, play_center: float) -> None:
+        """Initialize the note manager and allocate the note columns.
+
+        Args:
+            song (Song): Song object being played
+            assets (GameAssets): Assets object containing audio for notes
+            play_margain (float): Width of the play area
+            play_center (float): x-coordinate of the center of the play area
+
+        """
+        super().__init__(song, assets, play_margain, play_center)
+
+        self.count = 0
+        self.images: list[pygame.Surface] = []
+        self.allocate(self.INITIAL_CAPACITY)
+
+    def allocate(self, capacity: int) -> None:
+        """Allocate (or grow) the note columns to the given capacity, keeping the active notes.
+
+        Args:
+            capacity (int): Number of notes the columns can hold
+
+        """
+        for name, dtype in self.COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if self.count:
+                column[: self.count] = getattr(self, name)[: self.count]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def spawn_note(self, spawn_time: float) -> None:
+        """Spawn notes for the current slot and bar into the note columns.
+
+        Args:
+            spawn_time (float): The time the current slot was due, used to place the notes
+
+        """
+        notes = self.song.get_notes_for_time(self.current_bar + 1, self.current_slot + 1)
+        for note in notes:
+            if self.count == self.capacity:
+                self.allocate(self.capacity * 2)
+            image, center_y = self.get_note_image(note)
+            i = self.count
+            self.x[i] = std_cfg.NOTE_SPAWN_X
+            self.spawn_time[i] = spawn_time
+            self.bar[i] = note.bar
+            self.slot[i] = note.slot
+            self.center_y[i] = center_y
+            self.half_width[i] = image.get_width() // 2
+            self.half_height[i] = image.get_height() // 2
+            self.pitch[i] = note.pitch
+            self.note_type[i] = note.note_type
+            self.hit[i] = False
+            self.score[i] = 0
+            self.images.append(image)
+            self.count += 1
+
+    def update_notes(self, current_time: float) -> float:
+        """Update note positions, and remove notes that have been hit or are out of bounds.
+
+        Args:
+            current_time (float): The current song time in seconds
+
+        Returns:
+            float: Score of the notes removed this update
+
+        """
+        n = self.count
+        if n == 0:
+            return 0
+
+        left = np.rint(self.x[:n]) - self.half_width[:n]
+        remove = self.hit[:n] | (left < std_cfg.PLAY_AREA_Y)
+        score = int(self.score[:n][remove].sum())
+        if remove.any():
+            self.results.extend(
+                zip(
+                    self.bar[:n][remove].tolist(),
+                    self.slot[:n][remove].tolist(),
+                    self.pitch[:n][remove].tolist(),
+                    self.score[:n][remove].tolist(),
+                ),
+            )
+            keep = ~remove
+            kept = int(keep.sum())
+            for name in self.COLUMNS:
+                column = getattr(self, name)
+                column[:kept] = column[:n][keep]
+            self.images = [image for image, keep_image in zip(self.images, keep.tolist()) if keep_image]
+            self.count = n = kept
+
+        self.x[:n] = std_cfg.NOTE_SPAWN_X - (current_time - self.spawn_time[:n]) * std_cfg.NOTE_VELOCITY
+        return score
+
+    def is_finished(self) -> bool:
+        """Check whether every note of the song has been spawned and has left the screen.
+
+        Returns:
+            bool: True if the song has no notes left to play
+
+        """
+        return self.slots_spawned >= self.total_slots and self.count == 0
+
+    def judge_press(self, key: int, octave: int, press_time: float) -> None:
+        """Judge a key press against the notes on screen at the exact time of the press, over all notes at once.
+
+        Args:
+            key (int): The key that was pressed
+            octave (int): The octave of the keyboard when the key was pressed
+            press_time (float): The song time of the press in seconds
+
+        """
+        n = self.count
+        if n == 0 or key not in auxil.keys:
+            return
+
+        pitch = self.pitch[:n]
+        x = std_cfg.NOTE_SPAWN_X - (press_time - self.spawn_time[:n]) * std_cfg.NOTE_VELOCITY
+        distance = np.abs(x - self.play_center)
+        candidates = (
+            ~self.hit[:n]
+            & (distance <= self.play_margain)
+            & (pitch % 8 == auxil.keys.index(key))
+            & (pitch // 8 + std_cfg.MIN_OCTAVE == octave)
+        )
+        if not candidates.any():
+            return
+        i = int(np.argmin(np.where(candidates, distance, np.inf)))
+        self.score[i] = self.score_for_distance(float(distance[i]))
+        self.hit[i] = True
+
+    def draw(self, screen: pygame.Surface) -> list[pygame.Rect]:
+        """Draw the notes on the screen with a single batched blit.
+
+        Args:
+            screen (pygame.Surface): The display surface for the game.
+
+        Returns:
+            list[pygame.Rect]: The areas of the screen that were drawn on.
+
+        """
+        n = self.count
+        if n == 0:
+            return []
+        center_x = np.rint(self.x[:n]).astype(np.int32)
+        left = (center_x - self.half_width[:n]).tolist()
+        top = (self.center_y[:n] - self.half_height[:n]).tolist()
+        dirty = screen.blits(list(zip(self.images, zip(left, top))))
+        if std_cfg.DEBUG_MODE:
+            for position in zip(center_x.tolist(), self.center_y[:n].tolist()):
+                pygame.draw.circle(screen, auxil.RED, position, 5)
+        return dirty
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pygame
+
+import auxil
+import pcm_cache
+from cfg import std_cfg
+from resource_path import resource_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+# Note numbers of the keys of a piano, A0 to C8
+LOWEST_NOTE = 21
+HIGHEST_NOTE = 108
+
+
+def note_frequency(note: int) -> float:
+    """Get the frequency of a note number in equal temperament, where A4 (69) is 440 Hz.
+
+    Args:
+        note (int): The note number.
+
+    Returns:
+        float: The frequency in Hz.
+
+    """
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+
+def make_sound(wave: np.ndarray) -> pygame.mixer.Sound:
+    """Turn a mono waveform into a sound in the format of the active mixer.
+
+    Args:
+        wave (np.ndarray): Samples between -1.0 and 1.0.
+
+    Returns:
+        pygame.mixer.Sound: The sound, with the waveform on every channel.
+
+    """
+    _, size, channels = pygame.mixer.get_init()
+    if size == 32:
+        samples = wave.astype(np.float32)
+    else:
+        bits = abs(size)
+        peak = 2 ** (bits - 1) - 1
+        if size < 0:
+            samples = (wave * peak).astype(f"int{bits}")
+        else:
+            samples = (wave * peak + peak + 1).astype(f"uint{bits}")
+    if channels > 1:
+        samples = np.ascontiguousarray(np.repeat(samples[:, None], channels, axis=1))
+    return pygame.sndarray.make_sound(samples)
+
+
+class SynthBank:
+    """Note sounds synthesised from additive harmonics with an ADSR envelope, for every key of a piano.
+
+    A note is generated the first time it is asked for, as one vectorised NumPy operation, and kept in a bounded
+    cache with the least recently used note evicted first. Has the get and values interface of the dictionary of
+    note sounds loaded from sample files. Requires NumPy.
+
+    """
+
+    # Relative amplitude of each harmonic, starting with the fundamental
+    HARMONICS = (1.0, 0.5, 0.3, 0.2, 0.12, 0.08, 0.05, 0.03)
+    DURATION = 1.5
+    # Attack, decay and release in seconds and the sustain level, notes are usually faded out before the release
+    ATTACK = 0.005
+    DECAY = 0.3
+    SUSTAIN = 0.4
+    RELEASE = 0.3
+    # Peak level, leaving headroom for chords
+    LEVEL = 0.4
+
+    def __init__(self, cache_size: int = std_cfg.SYNTH_CACHE_SIZE) -> None:
+        """Initialize the synthesised note bank with an empty cache.
+
+        Args:
+            cache_size (int, optional): Most notes kept generated at once. Defaults to std_cfg.SYNTH_CACHE_SIZE.
+
+        """
+        self.cache_size = cache_size
+        self.sounds: OrderedDict[int, pygame.mixer.Sound] = OrderedDict()
+
+    def get(self, note: int) -> pygame.mixer.Sound | None:
+        """Get the sound of a note, generating it if it is not cached.
+
+        Args:
+            note (int): The note number.
+
+        Returns:
+            pygame.mixer.Sound | None: The sound, or None if the note is outside the range of a piano.
+
+        """
+        sound = self.sounds.get(note)
+        if sound is not None:
+            self.sounds.move_to_end(note)
+            return sound
+        if not LOWEST_NOTE <= note <= HIGHEST_NOTE:
+            return None
+        sound = make_sound(self.synthesise(note_frequency(note)))
+        self.sounds[note] = sound
+        if len(self.sounds) > self.cache_size:
+            self.sounds.popitem(last=False)
+        return sound
+
+    def synthesise(self, frequency: float) -> np.ndarray:
+        """Generate the waveform of a note.
+
+        Args:
+            frequency (float): Frequency of the fundamental in Hz.
+
+        Returns:
+            np.ndarray: Samples between -1.0 and 1.0 at the mixer frequency.
+
+        """
+        rate = pygame.mixer.get_init()[0]
+        t = np.arange(int(rate * self.DURATION)) / rate
+
+        harmonics = np.arange(1, len(self.HARMONICS) + 1)
+        amplitudes = np.array(self.HARMONICS)
+        # Harmonics above the Nyquist frequency would alias into lower tones
+        audible = harmonics * frequency < rate / 2
+        phases = np.outer(harmonics[audible] * 2 * np.pi * frequency, t)
+        wave = amplitudes[audible] @ np.sin(phases) / amplitudes.sum()
+
+        envelope = np.interp(
+            t,
+            (0.0, self.ATTACK, self.ATTACK + self.DECAY, self.DURATION - self.RELEASE, self.DURATION),
+            (0.0, 1.0, self.SUSTAIN, self.SUSTAIN, 0.0),
+        )
+        return wave * envelope * self.LEVEL
+
+    def values(self) -> Iterator[pygame.mixer.Sound]:
+        """Get the generated sounds.
+
+        Returns:
+            Iterator[pygame.mixer.Sound]: The sounds in the cache.
+
+        """
+        return iter(list(self.sounds.values()))
+
+
+def resample(sound: pygame.mixer.Sound, semitones: int) -> pygame.mixer.Sound:
+    """Shift the pitch of a sound by resampling it, as one vectorised linear interpolation over all channels.
+
+    A higher pitch plays the sound faster and makes it shorter. A lower pitch would make it longer, so it is cut to
+    the length of the original sound.
+
+    Args:
+        sound (pygame.mixer.Sound): The sound to shift.
+        semitones (int): How many semitones to shift the pitch by.
+
+    Returns:
+        pygame.mixer.Sound: The shifted sound.
+
+    """
+    samples = pygame.sndarray.array(sound)
+    positions = np.arange(0, len(samples) - 1, 2 ** (semitones / 12))[: len(samples)]
+    index = positions.astype(np.int64)
+    fraction = positions - index
+    if samples.ndim > 1:
+        fraction = fraction[:, None]
+    shifted = samples[index] * (1 - fraction) + samples[index + 1] * fraction
+    return pygame.sndarray.make_sound(np.ascontiguousarray(shifted.astype(samples.dtype)))
+
+
+class SampleBank:
+    """Note sounds for every key of a piano, derived from the recorded note samples.
+
+    Recorded notes are loaded up front and played as they are. Every other note, including sharps and flats, is
+    resampled from the nearest recording the first time it is asked for, and kept in a cache with the least recently
+    used notes evicted once the cache is over its memory budget. With SAMPLE_BANK_PERSIST resampled notes are also
+    kept in the PCM cache on disk. Has the get and values interface of a dictionary of note sounds. Without NumPy
+    only the recorded notes are available.
+
+    """
+
+    # Recorded samples are named by note and octave, like c5.ogg
+    RECORDING = re.compile(r"([a-g])(\d)\.ogg")
+    NOTE_SEMITONES = {"c": 0, "d": 2, "e": 4, "f": 5, "g": 7, "a": 9, "b": 11}
+
+    def __init__(
+        self,
+        sample_dir: str,
+        load_sound: Callable[[str], pygame.mixer.Sound],
+        budget: int = std_cfg.SAMPLE_BANK_BUDGET,
+    ) -> None:
+        """Initialize the sample bank and load the recordings found in a directory.
+
+        Args:
+            sample_dir (str): Directory of the recorded samples, relative to the resource path.
+            load_sound (Callable[[str], pygame.mixer.Sound]): Loads a recording from its path relative to the
+                resource path.
+            budget (int, optional): Memory budget in bytes for resampled notes. Defaults to
+                std_cfg.SAMPLE_BANK_BUDGET.
+
+        Raises:
+            pygame.error: If a recording cannot be loaded.
+            FileNotFoundError: If the sample directory does not exist.
+
+        """
+        self.budget = budget
+        # Path of the recording of every recorded note number
+        self.recordings: dict[int, str] = {}
+        for path in sorted(Path(resource_path(sample_dir)).iterdir()):
+            match = self.RECORDING.fullmatch(path.name)
+            if match:
+                name, octave = match.groups()
+                note = auxil.note_number(int(octave), self.NOTE_SEMITONES[name])
+                self.recordings[note] = f"{sample_dir}/{path.name}"
+
+        self.recorded = {note: load_sound(path) for note, path in self.recordings.items()}
+        self.sounds: OrderedDict[int, tuple[pygame.mixer.Sound, int]] = OrderedDict()
+        self.total_size = 0
+
+    def get(self, note: int) -> pygame.mixer.Sound | None:
+        """Get the sound of a note, resampling it if it is neither recorded nor cached.
+
+        Args:
+            note (int): The note number.
+
+        Returns:
+            pygame.mixer.Sound | None: The sound, or None if the note is outside the range of a piano or cannot be
+            derived from any recording.
+
+        """
+        recorded = self.recorded.get(note)
+        if recorded is not None:
+            return recorded
+        cached = self.sounds.get(note)
+        if cached is not None:
+            self.sounds.move_to_end(note)
+            return cached[0]
+        if np is None or not self.recorded or not LOWEST_NOTE <= note <= HIGHEST_NOTE:
+            return None
+
+        # The nearest recording, preferring to shift up on a tie so the sound gets shorter instead of cut off
+        source = min(self.recorded, key=lambda recorded: (abs(note - recorded), recorded > note))
+        shift = note - source
+        if std_cfg.SAMPLE_BANK_PERSIST:
+            sound = pcm_cache.load_derived_sound(
+                resource_path(self.recordings[source]),
+                f"shift{shift}",
+                lambda: resample(self.recorded[source], shift),
+            )
+        else:
+            sound = resample(self.recorded[source], shift)
+
+        frequency, sample_format, channels = pygame.mixer.get_init()
+        size = int(sound.get_length() * frequency) * channels * (abs(sample_format) // 8)
+        self.sounds[note] = (sound, size)
+        self.total_size += size
+        while self.total_size > self.budget and len(self.sounds) > 1:
+            _, (_, evicted_size) = self.sounds.popitem(last=False)
+            self.total_size -= evicted_size
+        return sound
+
+    def values(self) -> Iterator[pygame.mixer.Sound]:
+        """Get the loaded and resampled sounds.
+
+        Returns:
+            Iterator[pygame.mixer.Sound]: The sounds in the bank.
+
+        """
+        return iter([*self.recorded.values(), *(sound for sound, _ in self.sounds.values())])
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pygame
+
+import log
+from cfg import std_cfg
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def mixer_format() -> tuple[int, int, int]:
+    """Get the format of the active mixer.
+
+    Returns:
+        tuple[int, int, int]: Frequency, sample format and number of channels of the mixer.
+
+    """
+    mixer = pygame.mixer.get_init()
+    if mixer is None:
+        msg = "Mixer is not initialized"
+        raise pygame.error(msg)
+    return mixer
+
+
+def file_hash(path: Path) -> str:
+    """Get the SHA-1 hash of a file.
+
+    Args:
+        path (Path): Path to the file.
+
+    Returns:
+        str: The hex digest of the file contents.
+
+    """
+    digest = hashlib.sha1(usedforsecurity=False)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_paths(source: Path, fmt: tuple[int, int, int], variant: str = "") -> tuple[Path, Path]:
+    """Get the paths of the cached PCM data and its metadata for a source file in a given mixer format.
+
+    Args:
+        source (Path): Path to the compressed source file.
+        fmt (tuple[int, int, int]): The mixer format the PCM data is decoded to.
+        variant (str, optional): Names a sound derived from the source file, like a resampled note. Defaults to "",
+            the decoded source itself.
+
+    Returns:
+        tuple[Path, Path]: Path to the raw PCM data and path to its metadata.
+
+    """
+    key = f"{source.resolve()}|{fmt}|{variant}" if variant else f"{source.resolve()}|{fmt}"
+    name = hashlib.sha1(key.encode(), usedforsecurity=False).hexdigest()
+    cache_dir = Path(std_cfg.PCM_CACHE_DIR)
+    return cache_dir / f"{name}.pcm", cache_dir / f"{name}.json"
+
+
+def is_valid(source: Path, meta_path: Path, fmt: tuple[int, int, int]) -> bool:
+    """Check whether cached PCM data still matches its source file.
+
+    The source mtime and size are checked first. Only when they changed is the source hashed, so touching a file
+    without changing it does not force a decode.
+
+    Args:
+        source (Path): Path to the compressed source file.
+        meta_path (Path): Path to the metadata of the cached PCM data.
+        fmt (tuple[int, int, int]): The active mixer format.
+
+    Returns:
+        bool: True if the cached PCM data can be used, False otherwise.
+
+    """
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return False
+    if tuple(meta.get("format", ())) != fmt:
+        return False
+    stat = source.stat()
+    if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+        return True
+    if meta.get("sha1") != file_hash(source):
+        return False
+    meta["mtime_ns"] = stat.st_mtime_ns
+    meta["size"] = stat.st_size
+    meta_path.write_text(json.dumps(meta))
+    return True
+
+
+def write_cache(source: Path, sound: pygame.mixer.Sound, fmt: tuple[int, int, int], variant: str = "") -> None:
+    """Write the decoded PCM data of a sound and its metadata to the cache.
+
+    Args:
+        source (Path): Path to the compressed source file.
+        sound (pygame.mixer.Sound): The decoded sound.
+        fmt (tuple[int, int, int]): The mixer format the sound is decoded to.
+        variant (str, optional): Names a sound derived from the source file. Defaults to "".
+
+    """
+    pcm_path, meta_path = cache_paths(source, fmt, variant)
+    pcm_path.parent.mkdir(parents=True, exist_ok=True)
+    stat = source.stat()
+    meta = {
+        "source": str(source),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha1": file_hash(source),
+        "format": list(fmt),
+    }
+    # Write to temporary files first, so a crash or a concurrent loader never sees a half written cache entry
+    tmp_pcm = pcm_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_pcm.write_bytes(sound.get_raw())
+    tmp_pcm.replace(pcm_path)
+    tmp_meta = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_meta.write_text(json.dumps(meta))
+    tmp_meta.replace(meta_path)
+
+
+def load_sound(path: str) -> pygame.mixer.Sound:
+    """Load a sound, using pre-decoded PCM data from the on-disk cache when it is valid.
+
+    On a cache miss the file is decoded by pygame as usual, and the PCM data is written to the cache for next time.
+
+    Args:
+        path (str): Path to the compressed sound file.
+
+    Returns:
+        pygame.mixer.Sound: The loaded sound.
+
+    """
+    return load_derived_sound(path, "", lambda: pygame.mixer.Sound(path))
+
+
+def load_derived_sound(path: str, variant: str, derive: Callable[[], pygame.mixer.Sound]) -> pygame.mixer.Sound:
+    """Load a sound made from a source file, using its PCM data from the on-disk cache when it is valid.
+
+    The cache entry is invalidated when the source file changes. On a cache miss the sound is made with derive, and
+    its PCM data is written to the cache for next time.
+
+    Args:
+        path (str): Path to the source file.
+        variant (str): Names the sound among the sounds made from the source file, "" for the decoded file itself.
+        derive (Callable[[], pygame.mixer.Sound]): Makes the sound when it is not cached.
+
+    Returns:
+        pygame.mixer.Sound: The loaded sound.
+
+    """
+    if not std_cfg.PCM_CACHE:
+        return derive()
+
+    source = Path(path)
+    fmt = mixer_format()
+    pcm_path, meta_path = cache_paths(source, fmt, variant)
+    try:
+        if is_valid(source, meta_path, fmt) and pcm_path.stat().st_size > 0:
+            with pcm_path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return pygame.mixer.Sound(buffer=buffer)
+    except OSError as error:
+        log.log_write(f"PCM cache read failed for {path}: {error}", logging.WARNING)
+
+    sound = derive()
+    try:
+        write_cache(source, sound, fmt, variant)
+    except OSError as error:
+        log.log_write(f"PCM cache write failed for {path}: {error}", logging.WARNING)
+    return sound
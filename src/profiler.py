@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import csv
+import logging
+import time
+from array import array
+from pathlib import Path
+
+import pygame
+
+import auxil
+import log
+from cfg import std_cfg
+
+
+class FrameProfiler:
+    """Records how long each stage of a frame takes, for the last frames in a fixed-size ring buffer.
+
+    A frame is started with begin_frame and ended with end_frame. In between, lap is called right after each stage
+    and adds the time since the previous lap to that stage. Recording costs a few float writes per stage and does
+    not allocate, and a disabled profiler returns right away.
+
+    Methods:
+        begin_frame: Start timing a new frame
+        lap: Add the time since the previous lap to a stage
+        end_frame: Store the total time of the frame
+        percentiles: Get percentiles of every stage over the recorded frames
+        draw_overlay: Draw the stage percentiles and a frame time graph
+        dump_csv: Write the recorded frames to a CSV file
+
+    """
+
+    STAGES = ("input", "spawn", "notes", "audio", "playfield", "note_sprites", "hud", "overlay", "present")
+    # Frames between rebuilding the overlay, so the overlay itself stays cheap
+    OVERLAY_REFRESH = 15
+    GRAPH_FRAMES = 180
+    GRAPH_HEIGHT = 60
+
+    def __init__(self, capacity: int, *, enabled: bool = True) -> None:
+        """Initialize the profiler and allocate the ring buffer.
+
+        Args:
+            capacity (int): Number of frames kept.
+            enabled (bool, optional): Whether to record anything. Defaults to True.
+
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+        # One column per stage and a last column with the total time of the frame
+        self.columns = len(self.STAGES) + 1
+        self.stage_index = {stage: i for i, stage in enumerate(self.STAGES)}
+        self.samples = array("d", bytes(8 * capacity * self.columns))
+        self.empty_row = array("d", bytes(8 * self.columns))
+        self.count = 0
+        self.row = 0
+        self.frame_start = 0.0
+        self.last_lap = 0.0
+
+        self.show_overlay = False
+        self.overlay: pygame.Surface | None = None
+        self.overlay_age = 0
+
+    def begin_frame(self) -> None:
+        """Start timing a new frame in the next row of the ring buffer."""
+        if not self.enabled:
+            return
+        self.row = (self.count % self.capacity) * self.columns
+        self.samples[self.row : self.row + self.columns] = self.empty_row
+        self.frame_start = self.last_lap = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        """Add the time since the previous lap, or since the frame began, to a stage.
+
+        Args:
+            stage (str): The stage that just finished, one of STAGES.
+
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.samples[self.row + self.stage_index[stage]] += now - self.last_lap
+        self.last_lap = now
+
+    def end_frame(self) -> None:
+        """Store the total time of the frame."""
+        if not self.enabled:
+            return
+        self.samples[self.row + self.columns - 1] = time.perf_counter() - self.frame_start
+        self.count += 1
+
+    def frames(self) -> list[array]:
+        """Get the recorded frames, oldest first.
+
+        Returns:
+            list[array]: Time in seconds of every stage and of the whole frame, for each frame.
+
+        """
+        recorded = min(self.count, self.capacity)
+        first = self.count % self.capacity if self.count > self.capacity else 0
+        rows = [(first + i) % self.capacity * self.columns for i in range(recorded)]
+        return [self.samples[row : row + self.columns] for row in rows]
+
+    def percentiles(self, quantiles: tuple[float, ...] = (0.5, 0.95, 0.99)) -> dict[str, list[float]]:
+        """Get percentiles of every stage and of the whole frame over the recorded frames.
+
+        Args:
+            quantiles (tuple[float, ...], optional): The percentiles to get, as fractions. Defaults to
+                (0.5, 0.95, 0.99).
+
+        Returns:
+            dict[str, list[float]]: The percentiles in milliseconds for every stage and for "frame".
+
+        """
+        frames = self.frames()
+        if not frames:
+            return {}
+        result = {}
+        for column, name in enumerate((*self.STAGES, "frame")):
+            values = sorted(frame[column] for frame in frames)
+            result[name] = [values[int(q * (len(values) - 1))] * 1000 for q in quantiles]
+        return result
+
+    def build_overlay(self) -> pygame.Surface:
+        """Render the stage percentiles and a graph of the latest frame times.
+
+        Returns:
+            pygame.Surface: The overlay.
+
+        """
+        lines = [f"{'stage':<13}{'p50':>7}{'p95':>7}{'p99':>7} ms"]
+        lines += [
+            f"{name:<13}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}" for name, (p50, p95, p99) in self.percentiles().items()
+        ]
+        texts = [auxil.render_text(line, auxil.WHITE, 20) for line in lines]
+        line_height = texts[0].get_height()
+        width = max(max(text.get_width() for text in texts), self.GRAPH_FRAMES) + 10
+        height = line_height * len(texts) + self.GRAPH_HEIGHT + 15
+
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        for i, text in enumerate(texts):
+            overlay.blit(text, (5, 5 + i * line_height))
+
+        # Frame times as bars, with the frame budget as a line and the scale at twice the budget
+        budget = 1.0 / std_cfg.FPS
+        bottom = height - 5
+        budget_y = bottom - self.GRAPH_HEIGHT // 2
+        pygame.draw.line(overlay, auxil.GREEN, (5, budget_y), (width - 5, budget_y))
+        for x, frame in enumerate(self.frames()[-self.GRAPH_FRAMES :]):
+            bar = min(frame[-1] / (2 * budget), 1.0) * self.GRAPH_HEIGHT
+            color = auxil.RED if frame[-1] > budget else auxil.WHITE
+            pygame.draw.line(overlay, color, (5 + x, bottom), (5 + x, bottom - bar))
+        return overlay
+
+    def draw_overlay(self, screen: pygame.Surface) -> pygame.Rect | None:
+        """Draw the overlay in the top right corner if it is shown.
+
+        Args:
+            screen (pygame.Surface): The display surface to draw on.
+
+        Returns:
+            pygame.Rect | None: The area of the screen that was drawn on, or None if the overlay is hidden.
+
+        """
+        if not self.enabled or not self.show_overlay:
+            return None
+        if self.overlay is None or self.overlay_age >= self.OVERLAY_REFRESH:
+            self.overlay = self.build_overlay()
+            self.overlay_age = 0
+        self.overlay_age += 1
+        return screen.blit(self.overlay, self.overlay.get_rect(topright=(screen.get_width() - 10, 10)))
+
+    def toggle_overlay(self) -> None:
+        """Show or hide the overlay."""
+        self.show_overlay = not self.show_overlay
+        self.overlay = None
+
+    def dump_csv(self, path: str = std_cfg.PROFILER_CSV_FILE) -> None:
+        """Write the recorded frames to a CSV file, one row per frame with the time of every stage in milliseconds.
+
+        Args:
+            path (str, optional): Path of the CSV file. Defaults to std_cfg.PROFILER_CSV_FILE.
+
+        """
+        try:
+            with Path(path).open("w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(("frame", *self.STAGES, "total"))
+                first = max(0, self.count - self.capacity)
+                for i, frame in enumerate(self.frames()):
+                    writer.writerow((first + i, *(f"{value * 1000:.4f}" for value in frame)))
+        except OSError as error:
+            log.log_write(f"Could not write frame profile: {error}", logging.ERROR)
+            return
+        log.log_write(f"Wrote {min(self.count, self.capacity)} frames to {path}", logging.INFO)
+
+
+# Profiler shared by the main loop and the stages it times
+profiler = FrameProfiler(std_cfg.PROFILER_FRAMES, enabled=std_cfg.PROFILER)
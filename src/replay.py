@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import logging
+import struct
+import time
+from pathlib import Path
+
+import pygame
+
+import auxil
+import log
+from cfg import std_cfg
+
+# A replay file starts with a header followed by one fixed-width record per key event, all little-endian:
+#   header: magic, version, input offset, recorded score, event count,
+#           then the chart path as a u16 length prefixed UTF-8 string
+#   record: song time, key, octave, pressed
+MAGIC = b"PGRP"
+VERSION = 1
+SUFFIX = ".pgr"
+HEADER = struct.Struct("<4sHdqI")
+STRING_LENGTH = struct.Struct("<H")
+RECORD = struct.Struct("<dHBB")
+
+
+class ReplayRecorder:
+    """Records key events into a preallocated buffer of fixed-width records.
+
+    Recording an event packs it straight into the buffer, so it costs no allocation until the buffer is full, and
+    nothing at all on frames without key events.
+
+    """
+
+    INITIAL_EVENTS = 4096
+
+    def __init__(self) -> None:
+        """Initialize the recorder with an empty buffer."""
+        self.buffer = bytearray(self.INITIAL_EVENTS * RECORD.size)
+        self.count = 0
+
+    def record(self, song_time: float, key: int, octave: int, *, pressed: bool) -> None:
+        """Record a key event.
+
+        Args:
+            song_time (float): Song time of the event in seconds, before any latency correction
+            key (int): The key that was pressed or released
+            octave (int): The octave of the keyboard when the event happened
+            pressed (bool): True if the key was pressed, False if it was released
+
+        """
+        offset = self.count * RECORD.size
+        if offset == len(self.buffer):
+            self.buffer.extend(bytes(len(self.buffer)))
+        RECORD.pack_into(self.buffer, offset, song_time, key, octave, pressed)
+        self.count += 1
+
+    def events(self) -> list[tuple[float, int, int, bool]]:
+        """Get the recorded events.
+
+        Returns:
+            list[tuple[float, int, int, bool]]: (song time, key, octave, pressed) of every event, in order.
+
+        """
+        return unpack_events(memoryview(self.buffer)[: self.count * RECORD.size])
+
+    def save(self, path: Path, chart: str, input_offset: float, score: int) -> None:
+        """Write the recorded events to a replay file.
+
+        Args:
+            path (Path): Where to write the replay.
+            chart (str): Path of the chart that was played.
+            input_offset (float): The latency correction subtracted from press times when judging.
+            score (int): The score reached, to check playback against.
+
+        """
+        encoded = chart.encode()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, input_offset, score, self.count))
+                f.write(STRING_LENGTH.pack(len(encoded)))
+                f.write(encoded)
+                f.write(memoryview(self.buffer)[: self.count * RECORD.size])
+        except OSError as error:
+            log.log_write(f"Could not save replay {path}: {error}", logging.ERROR)
+            return
+        log.log_write(f"Saved replay of {self.count} key events to {path}", logging.INFO)
+
+
+class Replay:
+    """A recorded play of a chart, loaded from a replay file."""
+
+    def __init__(
+        self,
+        chart: str,
+        input_offset: float,
+        score: int,
+        events: list[tuple[float, int, int, bool]],
+    ) -> None:
+        """Initialize the replay.
+
+        Args:
+            chart (str): Path of the chart that was played.
+            input_offset (float): The latency correction subtracted from press times when judging.
+            score (int): The score that was reached.
+            events (list[tuple[float, int, int, bool]]): (song time, key, octave, pressed) of every key event.
+
+        """
+        self.chart = chart
+        self.input_offset = input_offset
+        self.score = score
+        self.events = events
+
+    @classmethod
+    def load(cls, path: str | Path) -> Replay:
+        """Load a replay file.
+
+        Args:
+            path (str | Path): Path to the replay file.
+
+        Returns:
+            Replay: The loaded replay.
+
+        Raises:
+            ValueError: If the file is not a replay in a supported version.
+
+        """
+        data = Path(path).read_bytes()
+        magic, version, input_offset, score, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            msg = f"{path} is not a version {VERSION} replay"
+            raise ValueError(msg)
+        offset = HEADER.size
+        (length,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        chart = data[offset : offset + length].decode()
+        offset += length
+        return cls(chart, input_offset, score, unpack_events(memoryview(data)[offset : offset + count * RECORD.size]))
+
+
+class ReplayPlayer:
+    """Feeds the events of a replay to a song as they come due, carrying their recorded song time and octave."""
+
+    def __init__(self, replay: Replay) -> None:
+        """Initialize the replay player at the start of the replay.
+
+        Args:
+            replay (Replay): The replay to play back.
+
+        """
+        self.events = replay.events
+        self.next_event = 0
+
+    def poll(self, current_time: float) -> list[pygame.event.Event]:
+        """Get the events to handle this frame.
+
+        Playable key events from the keyboard are dropped, so the replay is the only input to the song, while
+        other events like escape still work.
+
+        Args:
+            current_time (float): The current song time in seconds.
+
+        Returns:
+            list[pygame.event.Event]: Events from the event queue followed by the replay events that came due.
+
+        """
+        events = [
+            event
+            for event in pygame.event.get()
+            if event.type not in (pygame.KEYDOWN, pygame.KEYUP) or event.key not in auxil.keys
+        ]
+        while self.next_event < len(self.events) and self.events[self.next_event][0] <= current_time:
+            events.append(make_event(self.events[self.next_event]))
+            self.next_event += 1
+        return events
+
+
+def unpack_events(records: memoryview) -> list[tuple[float, int, int, bool]]:
+    """Unpack packed event records.
+
+    Args:
+        records (memoryview): Whole records, back to back.
+
+    Returns:
+        list[tuple[float, int, int, bool]]: (song time, key, octave, pressed) of every event.
+
+    """
+    return [(song_time, key, octave, bool(pressed)) for song_time, key, octave, pressed in RECORD.iter_unpack(records)]
+
+
+def make_event(key_event: tuple[float, int, int, bool]) -> pygame.event.Event:
+    """Make the pygame event of a recorded key event.
+
+    Args:
+        key_event (tuple[float, int, int, bool]): Song time, key, octave and pressed of the event.
+
+    Returns:
+        pygame.event.Event: A key event carrying its song time and octave, which InputHandler uses instead of the
+        time it handles the event at and the current octave.
+
+    """
+    song_time, key, octave, pressed = key_event
+    return pygame.event.Event(pygame.KEYDOWN if pressed else pygame.KEYUP, key=key, song_time=song_time, octave=octave)
+
+
+def replay_path(chart: str) -> Path:
+    """Get a new path in the replay directory for a replay of a chart.
+
+    Args:
+        chart (str): Path of the chart that was played.
+
+    Returns:
+        Path: Path of the replay file.
+
+    """
+    return Path(std_cfg.REPLAY_DIR) / f"{Path(chart).stem}-{time.strftime('%Y%m%d-%H%M%S')}{SUFFIX}"
+
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+# The simulation runs without a window or sound card, so the SDL dummy drivers are selected before pygame and the
+# assets module initialise SDL. Drivers chosen in the environment are kept.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import auxil
+from assets import GameAssets
+from cfg import std_cfg
+from music_engine import MusicPlayer, Song, StreamedBTrack
+from replay import SUFFIX as REPLAY_SUFFIX
+from replay import Replay, make_event
+from song_clock import SongClock
+from song_library import CHART_SUFFIXES
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# Play area of the game screen, matching the play box drawn by Game
+PLAY_CENTER = 375.0
+PLAY_MARGAIN = 25.0
+
+
+class SimulationClock(SongClock):
+    """A song clock that only moves when it is advanced, for running a song faster than realtime.
+
+    It never follows the b-track, since the b-track still plays in wall-clock time.
+
+    """
+
+    def __init__(self) -> None:
+        """Initialize the simulation clock at song time 0."""
+        self.time = 0.0
+        super().__init__(lambda: self.time)
+
+    def advance_to(self, song_time: float) -> None:
+        """Move the clock forward to the given song time.
+
+        Args:
+            song_time (float): The song time to move to, ignored if it is in the past.
+
+        """
+        self.time = max(self.time, song_time)
+
+    def follow(self, position_source: object, start_time: float) -> None:
+        """Keep running on simulated time instead of following a b-track."""
+
+
+class SilentBTrack(StreamedBTrack):
+    """A b-track that plays nothing, so a simulated song does not load, decode or stream the real b-track.
+
+    It is a streamed b-track, so it is never handed to a mixer channel, and the simulation clock ignores it.
+
+    """
+
+    def __init__(self) -> None:
+        """Initialize the silent b-track."""
+        super().__init__("")
+
+    def set_volume(self, volume: float) -> None:
+        """Ignore the volume, there is nothing to play."""
+
+    def play(self) -> None:
+        """Play nothing."""
+
+    def stop(self) -> None:
+        """Stop nothing."""
+
+    def get_pos(self) -> float | None:
+        """Report that nothing is playing."""
+        return None
+
+
+class SimulationResult:
+    """The outcome of a simulated run of a song."""
+
+    def __init__(self, score: int, results: list[tuple[int, int, int, int]], song_time: float) -> None:
+        """Initialize the simulation result.
+
+        Args:
+            score (int): The total score of the run.
+            results (list[tuple[int, int, int, int]]): (bar, slot, pitch, score) of every note, score 0 is a miss.
+            song_time (float): Song time in seconds when the last note left the screen.
+
+        """
+        self.score = score
+        self.results = results
+        self.song_time = song_time
+
+    @property
+    def hits(self) -> int:
+        """Number of notes that were hit."""
+        return sum(1 for result in self.results if result[3] > 0)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the result, with the score and the hit count."""
+        return f"SimulationResult(score={self.score}, hits={self.hits}/{len(self.results)})"
+
+
+def init_headless() -> None:
+    """Initialize pygame with the SDL dummy video and audio drivers, unless a display is already set up."""
+    if pygame.display.get_init() and pygame.display.get_surface() is not None:
+        return
+    auxil.init_mixer()
+    pygame.init()
+    # Sprites are converted to the display format, so a display surface has to exist
+    pygame.display.set_mode((std_cfg.SCREEN_WIDTH, std_cfg.SCREEN_HEIGHT))
+
+
+def perfect_inputs(song: Song, hold: float = 0.05) -> list[tuple[float, int, int, bool]]:
+    """Make the input stream of a player pressing every note at the exact center of the play area.
+
+    Args:
+        song (Song): The song to play.
+        hold (float, optional): How long each key is held in seconds, at most half a slot. Defaults to 0.05.
+
+    Returns:
+        list[tuple[float, int, int, bool]]: (song time, key, octave, pressed) of every key event, in order.
+
+    """
+    time_per_slot = 60 / (song.bpm * song.slots_per_bar / std_cfg.BEATS_PER_BAR)
+    hold = min(hold, time_per_slot / 2)
+    travel_time = (std_cfg.NOTE_SPAWN_X - PLAY_CENTER) / std_cfg.NOTE_VELOCITY
+    inputs = []
+    for note in song.notes:
+        slot_index = (note.bar - 1) * song.slots_per_bar + note.slot
+        press_time = slot_index * time_per_slot + travel_time
+        key = auxil.keys[note.pitch % 8]
+        octave = note.pitch // 8 + std_cfg.MIN_OCTAVE
+        inputs.append((press_time, key, octave, True))
+        inputs.append((press_time + hold, key, octave, False))
+    # Releases sort before presses at the same time, so a key can be pressed again right after it was released
+    return sorted(inputs)
+
+
+def simulate(
+    song: Song,
+    inputs: Iterable[tuple[float, int, int, bool]],
+    assets: GameAssets | None = None,
+    fps: float = std_cfg.FPS,
+    input_offset: float = 0.0,
+) -> SimulationResult:
+    """Run a song to its end as fast as possible, driven by a simulated clock and a given input stream.
+
+    Frames are stepped at the given frame rate like in the game, and every key event is handled at its exact song
+    time, so the run is deterministic. The b-track is replaced by a silent one, so it is never loaded.
+
+    Args:
+        song (Song): The song to run.
+        inputs (Iterable[tuple[float, int, int, bool]]): (song time, key, octave, pressed) of every key event, in
+            order, like the events of a replay.
+        assets (GameAssets | None, optional): Loaded game assets. Defaults to None, in which case they are loaded.
+        fps (float, optional): Simulated frame rate. Defaults to std_cfg.FPS.
+        input_offset (float, optional): Latency correction subtracted from press times when judging. Defaults to
+            0.0.
+
+    Returns:
+        SimulationResult: The score and the result of every note.
+
+    """
+    init_headless()
+    if assets is None:
+        assets = GameAssets()
+        assets.load()
+
+    clock = SimulationClock()
+    time_per_slot = 60 / (song.bpm * song.slots_per_bar / std_cfg.BEATS_PER_BAR)
+    play_b_time = time_per_slot + (std_cfg.NOTE_SPAWN_X - PLAY_CENTER) / std_cfg.NOTE_VELOCITY
+    player = MusicPlayer(song, assets, PLAY_CENTER, PLAY_MARGAIN, play_b_time, SilentBTrack(), input_offset, clock)
+    # A simulated run is never saved as a replay, so its key events are not recorded
+    player.recorder = None
+
+    pending = iter(inputs)
+    next_input = next(pending, None)
+    frame_time = 1.0 / fps
+    next_frame = frame_time
+    while not player.note_manager.is_finished():
+        if next_input is not None and next_input[0] < next_frame:
+            step_time = next_input[0]
+            events = []
+            while next_input is not None and next_input[0] == step_time:
+                events.append(make_event(next_input))
+                next_input = next(pending, None)
+        else:
+            step_time = next_frame
+            events = []
+            next_frame += frame_time
+        clock.advance_to(step_time)
+        player.update(frame_time, events)
+
+    player.stop()
+    return SimulationResult(player.score, player.note_manager.results, clock.now())
+
+
+def main() -> None:
+    """Run every given chart with perfect inputs, or play back every given replay, and print the scores.
+
+    Replays are played back with the inputs they recorded, and their score is checked against the recorded score.
+
+    Example:
+        python simulation.py songs replays/lullaby-20250101-120000.pgr
+
+    """
+    parser = argparse.ArgumentParser(description="Run charts or replays headless and faster than realtime.")
+    parser.add_argument("charts", type=Path, nargs="+", help="Charts, replays, or directories of them, to run")
+    parser.add_argument("--fps", type=float, default=std_cfg.FPS, help="Simulated frame rate")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.charts:
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.iterdir() if p.suffix in (*CHART_SUFFIXES, REPLAY_SUFFIX)))
+        else:
+            paths.append(path)
+
+    init_headless()
+    assets = GameAssets()
+    assets.load()
+    for path in paths:
+        start = time.perf_counter()
+        if path.suffix == REPLAY_SUFFIX:
+            replay = Replay.load(path)
+            result = simulate(Song.from_file(replay.chart), replay.events, assets, args.fps, replay.input_offset)
+            check = " matches" if result.score == replay.score else f" DIFFERS from recorded {replay.score}"
+        else:
+            song = Song.from_file(str(path))
+            result = simulate(song, perfect_inputs(song), assets, args.fps)
+            check = ""
+        elapsed = time.perf_counter() - start
+        print(
+            f"{path.name}: score {result.score}{check}, hit {result.hits}/{len(result.results)}, "
+            f"{result.song_time:.1f} s of song in {elapsed:.2f} s",
+        )
+
+
+if __name__ == "__main__":
+    main()
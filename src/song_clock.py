@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class PositionSource(Protocol):
+    """Anything that can report how far into its audio it is, like a streamed b-track."""
+
+    def get_pos(self) -> float | None:
+        """Return the playback position in seconds, or None if it is not known."""
+
+
+class SongClock:
+    """The single source of song time, shared by every manager of a song.
+
+    Song time runs from a high-resolution monotonic counter, starting at 0 when the clock is created. Once the
+    b-track plays and can report its position, the clock is disciplined by it. The difference between where the
+    b-track is and where the clock is gets corrected a little each frame, so the notes follow the audio without
+    visible jumps. Song time never runs backwards.
+
+    Methods:
+        now: Get the current song time
+        follow: Start disciplining the clock by a playing b-track
+        sync: Correct the clock towards the b-track position
+
+    """
+
+    # Fraction of the remaining error corrected per sync, and the largest step allowed in one sync
+    SMOOTHING = 0.1
+    MAX_STEP = 0.005
+    # Errors larger than this are not drift but a stall or seek, and are corrected at once
+    SNAP = 0.25
+
+    def __init__(self, time_source: Callable[[], float] = time.perf_counter) -> None:
+        """Initialize the song clock at song time 0.
+
+        Args:
+            time_source (Callable[[], float], optional): Monotonic counter in seconds. Defaults to
+                time.perf_counter.
+
+        """
+        self.time_source = time_source
+        self.origin = time_source()
+        self.correction = 0.0
+        self.last_time = 0.0
+        self.position_source: PositionSource | None = None
+        self.position_start = 0.0
+
+    def now(self) -> float:
+        """Get the current song time.
+
+        Returns:
+            float: Seconds since the start of the song.
+
+        """
+        current_time = self.time_source() - self.origin + self.correction
+        if current_time < self.last_time:
+            return self.last_time
+        self.last_time = current_time
+        return current_time
+
+    def follow(self, position_source: PositionSource, start_time: float) -> None:
+        """Start disciplining the clock by a b-track that started playing at the given song time.
+
+        Args:
+            position_source (PositionSource): The playing b-track.
+            start_time (float): Song time the b-track started at.
+
+        """
+        self.position_source = position_source
+        self.position_start = start_time
+
+    def sync(self) -> None:
+        """Correct the clock towards the position of the b-track it follows, called once per frame."""
+        if self.position_source is None:
+            return
+        position = self.position_source.get_pos()
+        if position is None:
+            return
+        error = self.position_start + position - (self.time_source() - self.origin + self.correction)
+        if abs(error) > self.SNAP:
+            self.correction += error
+        else:
+            self.correction += max(-self.MAX_STEP, min(self.MAX_STEP, error * self.SMOOTHING))
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import chart_format
+import log
+from cfg import std_cfg
+
+CHART_SUFFIXES = (".json", chart_format.SUFFIX)
+
+
+def read_metadata(path: Path) -> dict:
+    """Read the metadata shown in the song list from a chart file.
+
+    Binary charts only have their header read, JSON charts are parsed in full.
+
+    Args:
+        path (Path): Path to the chart file.
+
+    Returns:
+        dict: Title, difficulty and bpm of the song.
+
+    """
+    if chart_format.is_binary(path):
+        song_data = chart_format.read_metadata(path)
+    else:
+        with path.open() as f:
+            song_data = json.load(f)
+    return {
+        "title": song_data.get("title") or path.stem,
+        "difficulty": song_data.get("difficulty") or "Normal",
+        "bpm": song_data.get("bpm", std_cfg.BPM),
+    }
+
+
+class SongLibrary:
+    """Index of the metadata of every chart in the songs directory.
+
+    The index is stored on disk and each entry is validated by the mtime and size of its chart, so only new or
+    changed charts are read on startup, and those are read in parallel. The full chart is only parsed once a song
+    is chosen.
+
+    Methods:
+        scan: Update the index from the songs directory and return the songs in it
+
+    """
+
+    def __init__(self, song_dir: Path, index_path: Path) -> None:
+        """Initialize the song library.
+
+        Args:
+            song_dir (Path): Directory containing the chart files.
+            index_path (Path): Path to the stored metadata index.
+
+        """
+        self.song_dir = song_dir
+        self.index_path = index_path
+
+    def load_index(self) -> dict[str, dict]:
+        """Load the stored metadata index, or an empty index if it is missing or unreadable.
+
+        Returns:
+            dict[str, dict]: Metadata entries keyed by chart filename.
+
+        """
+        try:
+            with self.index_path.open() as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def save_index(self, index: dict[str, dict]) -> None:
+        """Store the metadata index.
+
+        Args:
+            index (dict[str, dict]): Metadata entries keyed by chart filename.
+
+        """
+        try:
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with tmp_path.open("w") as f:
+                json.dump(index, f)
+            tmp_path.replace(self.index_path)
+        except OSError as error:
+            log.log_write(f"Could not save song index: {error}", logging.WARNING)
+
+    def scan(self) -> list[dict]:
+        """Update the index from the songs directory and return the songs in it.
+
+        Returns:
+            list[dict]: Metadata of every song, with the chart path under "filename", sorted by title.
+
+        """
+        old_index = self.load_index()
+        index = {}
+        changed = []
+        for path in self.song_dir.iterdir():
+            if path.suffix not in CHART_SUFFIXES:
+                continue
+            stat = path.stat()
+            entry = old_index.get(str(path))
+            if entry and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+                index[str(path)] = entry
+            else:
+                changed.append((path, stat))
+
+        if changed:
+            with ThreadPoolExecutor() as executor:
+                results = executor.map(self.index_entry, changed)
+                for (path, _), entry in zip(changed, results):
+                    if entry:
+                        index[str(path)] = entry
+
+        if index != old_index:
+            self.save_index(index)
+
+        songs = [{"filename": filename, **entry} for filename, entry in index.items()]
+        return sorted(songs, key=lambda song: (str(song["title"]).lower(), song["filename"]))
+
+    @staticmethod
+    def index_entry(changed: tuple) -> dict | None:
+        """Read the index entry of a new or changed chart.
+
+        Args:
+            changed (tuple): Path to the chart and its stat result.
+
+        Returns:
+            dict | None: The index entry, or None if the chart could not be read.
+
+        """
+        path, stat = changed
+        try:
+            metadata = read_metadata(path)
+        except (OSError, ValueError) as error:
+            log.log_write(f"Could not read song {path}: {error}", logging.ERROR)
+            return None
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, **metadata}
@@ -143,6 +143,7 @@ class Button:
         self.surface = self.font.render(self.text, std_cfg.ANTIALIAS, self.color)
         self.hover_surface = self.font.render(self.text, std_cfg.ANTIALIAS, self.hover_color)
         self.rect = self.surface.get_rect(centerx=self.cen_x, y=self.y)
+        self.hover = False
 
     def update(self, new_cen_x: float, new_y: float) -> None:
         """Update the position of the button.
@@ -156,18 +157,29 @@ class Button:
         self.y = new_y
         self.rect = self.surface.get_rect(centerx=self.cen_x, y=self.y)
 
-    def draw(self, screen: pygame.Surface) -> None:
-        """Draw the button on the screen.
+    def update_hover(self, pos: tuple[int, int]) -> bool:
+        """Update the hover state of the button from the mouse position.
 
         Args:
-            screen (pygame.Surface): The display surface to draw on.
+            pos (tuple[int, int]): The position of the mouse.
 
-        """
-        pos = pygame.mouse.get_pos()
+        Returns:
+            bool: True if the hover state changed, False otherwise.
 
+        """
         hover = self.is_over(pos)
+        changed = hover != self.hover
+        self.hover = hover
+        return changed
 
-        if hover:
+    def draw(self, screen: pygame.Surface) -> None:
+        """Draw the button on the screen, using the hover state from the last update_hover.
+
+        Args:
+            screen (pygame.Surface): The display surface to draw on.
+
+        """
+        if self.hover:
             screen.blit(self.hover_surface, self.rect)
         else:
             screen.blit(self.surface, self.rect)